@@ -0,0 +1,189 @@
+import argparse
+import json
+import platform
+import random
+import tracemalloc
+from pathlib import PurePath
+from statistics import median
+from time import perf_counter
+
+from command_handler import CommandHandler
+from level_cache import load_level_spec
+from level_index import load_level_index
+from level_parser import parse_level
+from objects import Game
+from solver import get_actions
+from utils import LEVELS_DIR, SAVES_FILE_PATH, load_progress_data
+from verify import compile_solution, replay_programs
+
+
+def time_it(function, repeat, setup=None):
+    '''
+    Returns the median wall time of function() in seconds and its last result.
+    With setup, function(setup()) is run instead and only function is timed
+    '''
+    times = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = perf_counter()
+        result = function(*args)
+        times.append(perf_counter() - start)
+    return median(times), result
+
+
+def random_commands(level_file, number_of_commands, seed):
+    '''
+    A reproducible stream of (group_id, command) which are valid for the groups' unit types
+    '''
+    rng = random.Random(f'{seed}:{PurePath(level_file).name}')
+    actions = get_actions(Game(level_file))
+    return [rng.choice(actions) for _ in range(number_of_commands)] if actions else []
+
+
+def run_commands(game, commands):
+    for command in commands:
+        game.execute_on_group_status(command)
+    return game
+
+
+def throughput(seconds, number_of_commands):
+    return round(number_of_commands/seconds) if seconds else None
+
+
+def peak_memory(function):
+    '''
+    Peak traced memory of function() in KiB; measured apart from the timings since tracing slows Python down
+    '''
+    tracemalloc.start()
+    try:
+        function()
+        return round(tracemalloc.get_traced_memory()[1]/1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def parse_level_file(level_file):
+    with open(level_file) as f:
+        return parse_level(f)
+
+
+def benchmark_level(level_file, solutions, number_of_commands, seed, repeat):
+    # a cold load reads and parses the file, neither the specs loaded by this process nor the disk cache are used
+    cold_load_seconds, _ = time_it(lambda: parse_level_file(level_file), repeat)
+    # a warm load builds the Game from the spec this process has already loaded, for every repeat alike
+    load_level_spec(level_file)
+    load_seconds, _ = time_it(lambda: Game(level_file), repeat)
+    commands = random_commands(level_file, number_of_commands, seed)
+    random_seconds, _ = time_it(
+        lambda game: run_commands(game, commands), repeat, setup=lambda: Game(level_file))
+    result = {
+        'cold_load_ms': round(cold_load_seconds*1000, 3),
+        'load_ms': round(load_seconds*1000, 3),
+        'random': {'commands': len(commands), 'seconds': round(random_seconds, 6),
+                   'commands_per_sec': throughput(random_seconds, len(commands))},
+        'recorded': None,
+        'peak_kib': peak_memory(lambda: run_commands(Game(level_file), commands)),
+    }
+    if solutions:
+        # loading the games and compiling the solutions is not a part of the timing
+        programs = [compile_solution(CommandHandler(), solution) for solution in solutions]
+
+        def replay_all(games):
+            total = 0
+            for game, solution_programs in zip(games, programs):
+                replay_programs(game, solution_programs)
+                total += game.number_of_commands
+            return total
+        recorded_seconds, recorded_commands = time_it(
+            replay_all, repeat, setup=lambda: [Game(level_file) for _ in programs])
+        result['recorded'] = {'solutions': len(solutions), 'commands': recorded_commands,
+                              'seconds': round(recorded_seconds, 6),
+                              'commands_per_sec': throughput(recorded_seconds, recorded_commands)}
+    return result
+
+
+def benchmark(levels_dir=LEVELS_DIR, save_file=SAVES_FILE_PATH, number_of_commands=2000, seed=0, repeat=5):
+    '''
+    Runs every level of levels_dir headlessly: parsing the level file (cold load), Game loading
+    with the level spec already loaded (warm load),
+    a seeded random stream of valid commands and the solutions recorded in the save file.
+    Levels which fail to load are left out. Returns a dict which can be dumped as JSON
+    '''
+    progress = load_progress_data(save_file)
+    levels = {}
+    for filename, metadata in load_level_index(levels_dir).items():
+        if metadata['error']:
+            continue
+        solutions = [entry['solution']
+                     for entry in progress.get(filename, {}).values()]
+        levels[filename] = benchmark_level(PurePath(levels_dir, filename), solutions,
+                                           number_of_commands, seed, repeat)
+    commands = sum(level['random']['commands'] for level in levels.values())
+    seconds = sum(level['random']['seconds'] for level in levels.values())
+    return {
+        'python': platform.python_version(),
+        'settings': {'commands': number_of_commands, 'seed': seed, 'repeat': repeat},
+        'total': {'cold_load_ms': round(sum(level['cold_load_ms'] for level in levels.values()), 3),
+                  'load_ms': round(sum(level['load_ms'] for level in levels.values()), 3),
+                  'commands_per_sec': throughput(seconds, commands)},
+        'levels': levels,
+    }
+
+
+def compare(baseline, current):
+    '''
+    Returns the lines of a table comparing two benchmark results (ratios > 1 mean current is faster)
+    '''
+    def ratio(old, new):
+        return f'{old/new:.2f}x' if old and new else '-'
+
+    lines = [f'{"level":<16}{"cold load ms: old, new":>26}{"load ms: old, new":>26}{"commands/sec: old, new":>30}']
+    rows = [(filename, baseline['levels'][filename], level)
+            for filename, level in current['levels'].items() if filename in baseline['levels']]
+    rows.append(('total', baseline['total'], current['total']))
+    for filename, old, new in rows:
+        old_speed = old.get('random', old)['commands_per_sec']
+        new_speed = new.get('random', new)['commands_per_sec']
+        # results saved before cold loads were measured have none
+        old_cold, new_cold = old.get('cold_load_ms'), new.get('cold_load_ms')
+        lines.append(f'{filename:<16}{old_cold or 0:>9.3f}{new_cold or 0:>9.3f}{ratio(old_cold, new_cold):>8}'
+                     f'{old["load_ms"]:>9.3f}{new["load_ms"]:>9.3f}{ratio(old["load_ms"], new["load_ms"]):>8}'
+                     f'{old_speed or 0:>11}{new_speed or 0:>11}{ratio(new_speed, old_speed):>8}')
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure level loading, command throughput and memory of the engine on every level')
+    parser.add_argument('--levels-dir', default=LEVELS_DIR)
+    parser.add_argument('--save-file', default=SAVES_FILE_PATH,
+                        help='recorded solutions to replay')
+    parser.add_argument('--commands', type=int, default=2000,
+                        help='length of the random command stream per level')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='the median of this many runs is reported')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with the JSON results of an earlier run')
+    parser.add_argument('--current', metavar='RESULTS',
+                        help='with --compare: compare these saved results instead of running')
+    args = parser.parse_args()
+    if args.current:
+        with open(args.current) as f:
+            results = json.load(f)
+    else:
+        results = benchmark(args.levels_dir, args.save_file,
+                            args.commands, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(json.load(f), results)))
+    elif not args.current:
+        for filename, level in results['levels'].items():
+            recorded = level['recorded']
+            print(f'{filename:<16} cold load {level["cold_load_ms"]:8.3f} ms  load {level["load_ms"]:8.3f} ms  random {level["random"]["commands_per_sec"] or 0:>8} cmd/s  '
+                  f'recorded {recorded["commands_per_sec"] if recorded else "-":>8} cmd/s  peak {level["peak_kib"]:8.1f} KiB')
+        print(f'total: cold load {results["total"]["cold_load_ms"]:.3f} ms, load {results["total"]["load_ms"]:.3f} ms, {results["total"]["commands_per_sec"]} cmd/s')
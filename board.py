@@ -0,0 +1,230 @@
+from array import array
+from functools import lru_cache
+
+from utils import BOARD_SIZE, DIRECTIONS, SPARSE_FIELD_MIN_CELLS
+
+
+NO_NEIGHBOUR = -1
+
+
+def cell_index(pos, board_size=BOARD_SIZE):
+    return pos[0]*board_size[1] + pos[1]
+
+
+def cell_pos(index, board_size=BOARD_SIZE):
+    return divmod(index, board_size[1])
+
+
+@lru_cache(maxsize=16)
+def neighbour_table(board_size=BOARD_SIZE):
+    '''
+    Flat table of neighbour indices: neighbours[index*4 + direction] is the index
+    of the adjacent cell in that direction or NO_NEIGHBOUR outside of the borders.
+    Only for dense fields, sparse ones compute their neighbours on the fly
+    '''
+    rows, cols = board_size
+    if rows*cols > SPARSE_FIELD_MIN_CELLS:
+        raise ValueError(f'no neighbour table for a sparse {rows}x{cols} field')
+    neighbours = array('i', [NO_NEIGHBOUR]*(rows*cols*4))
+    for i in range(rows):
+        for j in range(cols):
+            for direction, (di, dj) in DIRECTIONS.items():
+                if 0 <= i + di < rows and 0 <= j + dj < cols:
+                    neighbours[(i*cols + j)*4 + direction] = (i + di)*cols + j + dj
+    return neighbours
+
+
+class SparseField:
+    '''
+    Field of a large board: cells are created on first access and stored by index,
+    so memory grows with the number of touched cells rather than with the board area.
+    Supports the same field[row][col] access as the list of lists used for small boards
+    '''
+
+    def __init__(self, board_size, cell_factory):
+        self.board_size = board_size
+        self.cell_factory = cell_factory
+        self.cells = {}
+
+    def cell(self, index):
+        cell = self.cells.get(index)
+        if cell is None:
+            cell = self.cells[index] = self.cell_factory(
+                cell_pos(index, self.board_size))
+        return cell
+
+    def peek(self, pos):
+        '''
+        Returns the cell at pos if it has ever been created, without creating it
+        '''
+        return self.cells.get(cell_index(pos, self.board_size))
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.board_size[0]:
+            raise IndexError(f'row {row} is outside of the field')
+        return SparseRow(self, row)
+
+    def __len__(self):
+        return self.board_size[0]
+
+
+class SparseRow:
+    def __init__(self, field: SparseField, row):
+        self.field = field
+        self.row = row
+
+    def __getitem__(self, col):
+        if not 0 <= col < self.field.board_size[1]:
+            raise IndexError(f'column {col} is outside of the field')
+        return self.field.cell(self.row*self.field.board_size[1] + col)
+
+    def __len__(self):
+        return self.field.board_size[1]
+
+
+EMPTY = -1
+ORIENTATIONS = ('h', 'v')
+
+
+class BoardLayout:
+    '''
+    Which units of a level have which part of the state, as indices into game.all_units.
+    It never changes during a game, so a game and its clones share it
+    '''
+
+    def __init__(self, units, board_size, sparse):
+        self.board_size = board_size
+        self.sparse = sparse
+        self.number_of_cells = board_size[0]*board_size[1]
+        self.number_of_units = len(units)
+        self.holders = [i for i, unit in enumerate(units) if hasattr(unit, 'holds')]
+        self.stacks = [i for i, unit in enumerate(units) if hasattr(unit, 'stack')]
+        self.directed = [i for i, unit in enumerate(units) if hasattr(unit, 'direction')]
+        self.oriented = [i for i, unit in enumerate(units) if hasattr(unit, 'orientation')]
+        self.controllable = [i for i, unit in enumerate(units) if unit.IS_CONTROLLABLE]
+        self.portals = [i for i, unit in enumerate(units) if hasattr(unit, 'active')]
+        self.typos = [i for i, unit in enumerate(units) if hasattr(unit, 'eliminated')]
+        # cell and unit indices fit into 16 bits on all but huge boards
+        self.typecode = 'h' if max(self.number_of_cells, len(units)) < 2**15 else 'i'
+
+
+class CompactBoard:
+    '''
+    Array-backed snapshot of everything which changes during a game, see Game.snapshot.
+    Units are referred to by their index in game.all_units (unit.index) and cells by
+    row*cols + col; one flat typed array holds, in this order:
+        contents -- per cell: the unit in it or EMPTY (a sparse field stores the number
+                    of occupied cells followed by (cell, unit) pairs instead)
+        pos -- per unit: the cell it is in, the one it was crushed in by an anvil or EMPTY
+               (controllable units keep theirs in containers too)
+        holds -- per unit which can hold one: the unit held or EMPTY
+        stacks -- per stack: its size followed by its units from the bottom up
+        direction, orientation -- per unit which has one (orientation 0 is 'h')
+        is_active -- per unit, then active per portal and eliminated per typo
+    The submitted letters, units left pending by a failed command and the number of commands
+    are kept aside. Two boards are equal (and hash alike) when their states are, whatever
+    the number of commands or pending units
+    '''
+    __slots__ = ('data', 'submitted', 'pending', 'number_of_commands', 'hash')
+
+    def __init__(self, data, submitted, pending=(), number_of_commands=0):
+        self.data = data
+        self.submitted = submitted
+        self.pending = pending
+        self.number_of_commands = number_of_commands
+        self.hash = None
+
+    @classmethod
+    def from_game(cls, game, layout: BoardLayout):
+        units = game.all_units
+        cols = layout.board_size[1]
+        if layout.sparse:
+            occupied = [(index, cell.contents.index) for index, cell in game.field.cells.items()
+                        if cell.contents is not None]
+            values = [len(occupied)] + [value for pair in occupied for value in pair]
+        else:
+            values = [EMPTY if cell.contents is None else cell.contents.index
+                      for cell in game.cells]
+            occupied = [(index, unit) for index, unit in enumerate(values) if unit != EMPTY]
+        # out of the field only a controllable unit's pos is ever used (it acts from there)
+        # and a crushed unit's, others are stale and would tell equal states apart
+        positions = [EMPTY]*len(units)
+        is_active = [unit.is_active for unit in units]
+        for i in layout.controllable if all(is_active) else range(len(units)):
+            unit = units[i]
+            if unit.pos is not None and (unit.IS_CONTROLLABLE or not unit.is_active):
+                positions[i] = unit.pos[0]*cols + unit.pos[1]
+        for index, unit in occupied:
+            positions[unit] = index
+        values += positions
+        values += [EMPTY if units[i].holds is None else units[i].holds.index
+                   for i in layout.holders]
+        for i in layout.stacks:
+            stack = units[i].stack
+            values.append(len(stack))
+            values += [unit.index for unit in stack]
+        values += [units[i].direction for i in layout.directed]
+        values += [units[i].orientation != 'h' for i in layout.oriented]
+        values += is_active
+        values += [units[i].active for i in layout.portals]
+        values += [units[i].eliminated for i in layout.typos]
+        pending = tuple(sorted((cell.pos[0]*cols + cell.pos[1], cell.pending.index)
+                               for cell in game.pending_cells))
+        return cls(array(layout.typecode, values), ''.join(game.submitted), pending,
+                   game.number_of_commands)
+
+    def restore(self, game, layout: BoardLayout):
+        '''
+        Puts a game of the same level into the state of the board; the references between
+        its units and cells are all set anew
+        '''
+        units = game.all_units
+        values = iter(self.data)
+        if layout.sparse:
+            field = game.field
+            for cell in field.cells.values():
+                cell.contents = None
+            for _ in range(next(values)):
+                cell = field.cell(next(values))
+                cell.contents = units[next(values)]
+            cells = None
+        else:
+            cells = game.cells
+            for cell, unit in zip(cells, values):
+                cell.contents = None if unit == EMPTY else units[unit]
+        for unit, index in zip(units, values):
+            if index == EMPTY:
+                unit.pos = None
+            else:
+                unit.pos = cell_pos(index, layout.board_size) if cells is None else cells[index].pos
+        for i, held in zip(layout.holders, values):
+            units[i].holds = None if held == EMPTY else units[held]
+        for i in layout.stacks:
+            units[i].stack = [units[next(values)] for _ in range(next(values))]
+        for i, direction in zip(layout.directed, values):
+            units[i].direction = direction
+        for i, orientation in zip(layout.oriented, values):
+            units[i].orientation = ORIENTATIONS[orientation]
+        for unit, is_active in zip(units, values):
+            unit.is_active = bool(is_active)
+        for i, active in zip(layout.portals, values):
+            units[i].active = bool(active)
+        for i, eliminated in zip(layout.typos, values):
+            units[i].eliminated = bool(eliminated)
+        game.submitted[:] = self.submitted
+        for cell in game.pending_cells:
+            cell.pending = None
+        game.pending_cells.clear()
+        for index, unit in self.pending:
+            cell = game.field.cell(index) if cells is None else cells[index]
+            cell.pending = units[unit]
+            game.pending_cells.add(cell)
+
+    def __eq__(self, other):
+        return isinstance(other, CompactBoard) and self.submitted == other.submitted \
+            and self.data == other.data
+
+    def __hash__(self):
+        if self.hash is None:
+            self.hash = hash((self.data.tobytes(), self.submitted))
+        return self.hash
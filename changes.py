@@ -0,0 +1,32 @@
+class ChangeLog:
+    '''
+    What changed in a game since the log was last drained; it is filled by the
+    hooks which keep the state hash up to date (see Game.track_changes):
+        touched_cells -- positions of the cells whose contents or look changed
+        moved_units -- ids of the units put into or taken out of a cell
+        changed_units -- ids of the units whose state (direction, holds, stack, ...) changed
+    '''
+
+    def __init__(self):
+        self.touched_cells = set()
+        self.moved_units = set()
+        self.changed_units = set()
+
+    def cell_changed(self, pos, unit):
+        self.touched_cells.add(pos)
+        if unit is not None:
+            self.moved_units.add(unit.id)
+
+    def unit_changed(self, unit):
+        self.changed_units.add(unit.id)
+        # a unit held by a container has no position and touches no cell
+        if unit.pos is not None:
+            self.touched_cells.add(unit.pos)
+
+    def drain(self):
+        '''
+        Returns (touched_cells, moved_units, changed_units) and starts over
+        '''
+        drained = self.touched_cells, self.moved_units, self.changed_units
+        self.__init__()
+        return drained
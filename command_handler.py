@@ -1,114 +1,255 @@
-from types import SimpleNamespace
-from exceptions import CommandSyntaxError, EmptyPrompt, NotASingleCommand, UnmatchedParentheses, IncorrectLoopSyntax, IncorrectReferencesSyntax
-import re
+import sys
+from itertools import islice
+from exceptions import CommandSyntaxError, EmptyPrompt, IncorrectLoopSyntax, UnmatchedParentheses
 
 
-class CommandHandler:
+class Loop:
+    '''
+    A loop node of a compiled program: body (commands and nested loops) repeated iterations times
+    '''
+    __slots__ = ('iterations', 'body', 'body_size', 'size')
 
-    def valid_parentheses(s):
-        stack = []
-        parentheses = ['()', '[]']
-        parentheses_set = {'(', ')', '[', ']'}
-        open_close = {el[0]: el[1] for el in parentheses}
-        for ch in s:
-            if ch in parentheses_set:
-                if ch in open_close:
-                    stack.append(open_close[ch])
-                else:
-                    if not stack or ch != stack.pop():
-                        return False
-        return not stack
+    def __init__(self, iterations, body):
+        self.iterations = iterations
+        self.body = body
+        self.body_size = nodes_size(body)
+        self.size = self.iterations*self.body_size
 
-    def __init__(self):
-        self.pattern_commands_on_single_group = re.compile(r'(\d+)([a-z+-]+)')
-        self.pattern_loops = re.compile(r'(\d+)\[([^\[\]]+)\]')
-        self.pattern_references = re.compile(r'#(\d+)')
-        self.pattern_cmds = re.compile(r'(\d+)([a-z+-])$')
 
-    def commands_on_single_group(self, raw_text):
-        if not raw_text:
-            raise EmptyPrompt('There is nothing to execute')
-        try:
-            group_id_str, cmd_char = self.pattern_commands_on_single_group.search(
-                raw_text).groups()
-        except:
-            raise CommandSyntaxError(f'Syntax error: {raw_text}')
-        group_id = int(group_id_str)
-        return [(group_id, char) for char in cmd_char]
-
-    def simple_command_sequence(self, raw_text):
+def nodes_size(nodes):
+    return sum(node.size if isinstance(node, Loop) else len(node[1]) for node in nodes)
+
+
+def iterate_nodes(nodes, start=0):
+    '''
+    Lazily yields the (group_id, cmd) commands of nodes skipping the first start of them;
+    whole nodes and loop iterations before start are skipped without being expanded.
+    Nested loops are walked with an explicit stack of [nodes, index, iterations left]
+    so that deep nesting does not hit the recursion limit
+    '''
+    stack = [[nodes, 0, 0]]
+    while stack:
+        frame = stack[-1]
+        body, index, iterations_left = frame
+        if index == len(body):
+            if iterations_left:
+                frame[1] = 0
+                frame[2] -= 1
+            else:
+                stack.pop()
+            continue
+        frame[1] += 1
+        node = body[index]
+        if isinstance(node, Loop):
+            if start >= node.size:
+                start -= node.size
+                continue
+            first_iteration, start = divmod(start, node.body_size)
+            stack.append([node.body, 0, node.iterations - first_iteration - 1])
+        else:
+            group_id, cmds = node
+            if start >= len(cmds):
+                start -= len(cmds)
+                continue
+            for cmd in cmds[start:]:
+                yield group_id, cmd
+            start = 0
+
+
+def nodes_prompt(nodes):
+    '''
+    Prompt text which compiles back to nodes: [(0, 'tc'), Loop(3, [(1, '+')])] -> "0tc 3[1+]".
+    Nested loops are written out with an explicit stack like in iterate_nodes
+    '''
+    words = []
+    # whether the next word goes right after an opening bracket
+    glued = False
+    stack = [iter(nodes)]
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            if stack:
+                words[-1] += ']'
+                glued = False
+            continue
+        word = f'{node.iterations}[' if isinstance(node, Loop) else f'{node[0]}{node[1]}'
+        if glued:
+            words[-1] += word
+        else:
+            words.append(word)
+        glued = isinstance(node, Loop)
+        if glued:
+            stack.append(iter(node.body))
+    return ' '.join(words)
+
+
+class Program:
+    '''
+    A compiled prompt: a list of Loop nodes and (group_id, cmds) nodes, the latter standing
+    for the commands cmds given one by one to a group: (0, 'tcp') -> 0t 0c 0p.
+    Commands are produced lazily, so loops are never expanded in memory
+    '''
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.size = nodes_size(nodes)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iterate_nodes(self.nodes)
+
+    def iterate_from(self, start):
+        return iterate_nodes(self.nodes, start)
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError('program index out of range')
+        return next(self.iterate_from(index))
+
+    def prompt(self, stop=None):
         '''
-        "result" for raw_text without loops and groups
+        A prompt which compiles to the first stop commands of the program (all of them by default);
+        loops which run whole are kept as loops, a loop cut short is written as its whole iterations
+        followed by the commands of the last one
         '''
-        result = []
-        for raw_command in raw_text.split():
-            result.extend(self.commands_on_single_group(raw_command))
-        return result
+        if stop is None or stop >= self.size:
+            return nodes_prompt(self.nodes)
+        prefix = []
+        nodes = self.nodes
+        while stop > 0:
+            for index, node in enumerate(nodes):
+                size = node.size if isinstance(node, Loop) else len(node[1])
+                if stop < size:
+                    break
+                stop -= size
+            prefix.extend(nodes[:index])
+            if stop == 0:
+                break
+            if isinstance(node, Loop):
+                iterations, stop = divmod(stop, node.body_size)
+                if iterations:
+                    prefix.append(Loop(iterations, node.body))
+                nodes = node.body
+            else:
+                prefix.append((node[0], node[1][:stop]))
+                break
+        return nodes_prompt(prefix)
 
-    def get_command_sequence(self, raw_text):
+    def display(self, start, amount):
+        '''
+        Display strings ("0t") of at most amount commands beginning with the command number start
+        '''
+        return [f'{group_id}{cmd}' for group_id, cmd in islice(self.iterate_from(start), amount)]
+
+
+DIGITS = '0123456789'
+COMMAND_CHARS = 'abcdefghijklmnopqrstuvwxyz+-'
+# group ids and loop iterations have at most this many digits
+MAX_NUMBER_DIGITS = 9
+# so that len() of a program never overflows
+MAX_PROGRAM_SIZE = sys.maxsize
+
+
+class CommandHandler:
+    def compile(self, raw_text) -> Program:
+        '''
+        Parses a prompt in a single pass; loops can be nested: 3[2[0c] 1+].
+        The prompt is split into words by whitespace; a word of commands to one group (0tcp)
+        is taken whole, other words are scanned character by character.
+        Syntax errors carry the 1-based column where they were found
+        '''
         if not raw_text:
             raise EmptyPrompt('There is nothing to execute')
-        if not CommandHandler.valid_parentheses(raw_text):
+        nodes = []
+        # enclosing blocks: (closing bracket, column of the opening one, iterations, outer nodes)
+        open_blocks = []
+        words = raw_text.split()
+        # where the words end in raw_text, found only up to the last word which needed it
+        word_ends = []
+        for index, word in enumerate(words):
+            cmds = word.lstrip(DIGITS)
+            if cmds and len(cmds) < len(word) <= len(cmds) + MAX_NUMBER_DIGITS and not cmds.lstrip(COMMAND_CHARS):
+                nodes.append((int(word[:len(word) - len(cmds)]), cmds))
+                continue
+            while len(word_ends) <= index:
+                located = words[len(word_ends)]
+                word_ends.append(raw_text.find(
+                    located, word_ends[-1] if word_ends else 0) + len(located))
+            word_start = word_ends[index] - len(word)
+            position = 0
+            length = len(word)
+            while position < length:
+                ch = word[position]
+                if ch in DIGITS:
+                    start = position
+                    while position < length and word[position] in DIGITS:
+                        position += 1
+                    if position - start > MAX_NUMBER_DIGITS:
+                        raise CommandSyntaxError(
+                            f'Number {word[start:start + MAX_NUMBER_DIGITS]}... is too large', column=word_start + start + 1)
+                    number = int(word[start:position])
+                    cmds_start = position
+                    while position < length and word[position] in COMMAND_CHARS:
+                        position += 1
+                    if position > cmds_start:
+                        nodes.append((number, word[cmds_start:position]))
+                    elif position < length and word[position] == '[':
+                        position += 1
+                        open_blocks.append(
+                            (']', word_start + position, number, nodes))
+                        nodes = []
+                    else:
+                        raise CommandSyntaxError(
+                            f'Group id {number} is not followed by commands', column=word_start + start + 1)
+                elif ch == '(':
+                    position += 1
+                    open_blocks.append((')', word_start + position, 1, nodes))
+                    nodes = []
+                elif ch == ']' or ch == ')':
+                    position += 1
+                    if not open_blocks or open_blocks[-1][0] != ch:
+                        raise UnmatchedParentheses(
+                            f'Unexpected "{ch}"', column=word_start + position)
+                    _, column, iterations, outer_nodes = open_blocks.pop()
+                    if ch == ']':
+                        loop = Loop(iterations, nodes)
+                        if loop.size > MAX_PROGRAM_SIZE:
+                            raise IncorrectLoopSyntax(
+                                f'The loop runs more than {MAX_PROGRAM_SIZE} commands', column=column)
+                        outer_nodes.append(loop)
+                    else:
+                        outer_nodes.extend(nodes)
+                    nodes = outer_nodes
+                elif ch == '[':
+                    raise CommandSyntaxError(
+                        'A loop needs a number of iterations: N[...]', column=word_start + position + 1)
+                else:
+                    raise CommandSyntaxError(
+                        f'Unexpected character "{ch}"', column=word_start + position + 1)
+        if open_blocks:
+            closing, column, _, _ = open_blocks[-1]
             raise UnmatchedParentheses(
-                'Some parentheses are unmatched in the command')
-        if not set('[]()').intersection(set(raw_text)):
-            res = self.simple_command_sequence(raw_text)
-            return res, list(map(lambda x: f'{x[0]}{x[1]}', res))
-        
-        result = []
-        loops = self.find_loops(raw_text)
-        individual_commands = self.find_commands_on_single_groups(raw_text)
-        merged = loops + individual_commands
-        merged.sort(key=lambda x: x.span[0])
-        for m in merged:
-            if m.type == 'cmd':
-                result.extend(self.simple_command_sequence(m.cmd))
-            elif m.type == 'loop':
-                result.extend(self.simple_command_sequence(
-                    m.body) * m.iterations)
+                f'"{raw_text[column - 1]}" is never closed with "{closing}"', column=column)
+        program = Program(nodes)
+        if program.size > MAX_PROGRAM_SIZE:
+            raise CommandSyntaxError(
+                f'The prompt runs more than {MAX_PROGRAM_SIZE} commands')
+        return program
+
+    def get_command_sequence(self, raw_text):
+        '''
+        Fully expanded commands and their display strings; prefer compile for long programs
+        '''
+        result = list(self.compile(raw_text))
         result_to_display = list(
             map(lambda x: f'{x[0]}{x[1]}', result))
         return result, result_to_display
 
-    def find_loops(self, text):
-        loops = []  # (span, iterations, body)
-        self.loop_spans = []
-        for loop in self.pattern_loops.finditer(text):
-            iterations, body = loop.groups()
-            loops.append(SimpleNamespace(
-                type='loop', span=loop.span(), iterations=int(iterations), body=body))
-            self.loop_spans.append(loop.span())
-        return loops
-
-    # def find_groups(self, text):
-    #     self.groups = []
-    #     for el in self.pattern_groups.finditer(text):
-    #         print('group', el)
-
-    # def find_references(self, text):
-    #     for el in self.pattern_references.finditer(text):
-    #         print('ref', el)
-
-    def find_commands_on_single_groups(self, text):
-        # finds commands outside of loops
-        ind_commands = []  # (span, (group_id, cmd_char))
-        for cmd in self.pattern_commands_on_single_group.finditer(text):
-            if not any((CommandHandler.is_subsector(cmd.span(), loop_span) for loop_span in self.loop_spans)):
-                ind_commands.append(SimpleNamespace(
-                    type='cmd', span=cmd.span(), cmd=cmd.group()))
-        return ind_commands
-
-    @staticmethod
-    def is_subsector(sector1, sector2):
-        return sector2[0] < sector1[0] and sector1[1] < sector2[1]
-
 
 if __name__ == '__main__':
     ch = CommandHandler()
-    # text = '1t 2[1c] 1ef 2[3rr 2qc 1c] 1tq 4f'
-    # ch.find_loops(text)
-    text = '1trev 3g 45fd'
-    # print(ch.find_loops(text))
-    # print(ch.find_commands_on_single_groups(text))
-    # print(CommandHandler.is_subsector((1, 4), (3, 8)))
+    text = '1trev 3[2[3g] 1c] 45fd'
     print(ch.get_command_sequence(text))
@@ -130,11 +130,36 @@ class LevelCreationError(CustomException):
     pass
 
 
+class LevelSyntaxError(LevelCreationError):
+    def __init__(self, message='', line=None, column=None):
+        if line is not None:
+            message = f'{message} at line {line}, column {column}'
+        super().__init__(message)
+        self.line = line
+        self.column = column
+
+
 class UnmatchedCreationPattern(LevelCreationError):
     pass
 
 
-class GroupOfDifferentTypes(LevelCreationError):
+class GroupOfDifferentTypes(LevelSyntaxError):
+    pass
+
+
+class UnknownUnit(LevelSyntaxError):
+    pass
+
+
+class NonExistingGroupMember(LevelSyntaxError):
+    pass
+
+
+class InvalidGroupMember(LevelSyntaxError):
+    pass
+
+
+class InvalidUnitArgument(LevelSyntaxError):
     pass
 
 
@@ -144,14 +169,22 @@ class SubmitterNotFound(LevelCreationError):
 
 class WordsNotSpecified(LevelCreationError):
     pass
-# ...
 
 
-class UnmatchedParentheses(CommandWarning):
+class UnitOutsideOfField(LevelSyntaxError):
     pass
+# ...
 
 
 class CommandSyntaxError(CommandWarning):
+    def __init__(self, message='', column=None):
+        if column is not None:
+            message = f'{message} at column {column}'
+        super().__init__(message)
+        self.column = column
+
+
+class UnmatchedParentheses(CommandSyntaxError):
     pass
 
 
@@ -0,0 +1,90 @@
+from math import inf
+
+
+POSSIBLE = 'possible'
+WON = 'won'
+DEAD = 'dead'
+
+
+class TrieNode:
+    __slots__ = ('children', 'is_word', 'letters_left')
+
+    def __init__(self):
+        self.children = {}
+        self.is_word = False
+        # the fewest letters which still make a word from here
+        self.letters_left = inf
+
+
+# tries by the words they hold, shared by all games of a level and their clones
+tries = {}
+
+
+def build_trie(words) -> TrieNode:
+    key = tuple(words)
+    if key in tries:
+        return tries[key]
+    root = TrieNode()
+    for word in words:
+        node = root
+        nodes = [node]
+        for letter in word:
+            node = node.children.setdefault(letter, TrieNode())
+            nodes.append(node)
+        node.is_word = True
+        for depth, node in enumerate(nodes):
+            node.letters_left = min(node.letters_left, len(word) - depth)
+    tries[key] = root
+    return root
+
+
+class Goals:
+    '''
+    How far a game is from victory, updated as it goes so that every question is O(1):
+        node -- the trie node of the submitted letters, None once they are not a prefix of any word
+        typos_left -- the number of typos which are not eliminated yet
+    The trie is shared, copy() gives independent progress
+    '''
+
+    def __init__(self, words, typos_left=0):
+        self.root = self.node = build_trie(words)
+        self.typos_left = typos_left
+
+    def restart(self, submitted, typos_left):
+        '''
+        Sets the progress of a game with the submitted letters and typos_left typos left
+        '''
+        self.node = self.root
+        for letter in submitted:
+            self.submit(letter)
+        self.typos_left = typos_left
+
+    def submit(self, letter):
+        if self.node is not None:
+            self.node = self.node.children.get(letter)
+
+    def typo_eliminated(self):
+        self.typos_left -= 1
+
+    def word_created(self) -> bool:
+        return self.node is not None and self.node.is_word
+
+    def status(self) -> str:
+        if self.node is None:
+            return DEAD
+        if self.node.is_word and not self.typos_left:
+            return WON
+        return POSSIBLE
+
+    def letters_left(self):
+        '''
+        The fewest letters still to submit for a word (inf if dead)
+        '''
+        return inf if self.node is None else self.node.letters_left
+
+    def copy(self) -> 'Goals':
+        goals = Goals.__new__(Goals)
+        goals.root = self.root
+        goals.node = self.node
+        goals.typos_left = self.typos_left
+        return goals
@@ -1,4 +1,5 @@
-from time import time
+from contextlib import contextmanager
+from time import perf_counter
 from types import SimpleNamespace
 
 import pygame, pygame_gui
@@ -8,10 +9,52 @@ from pygame_gui.core import ObjectID
 
 from exceptions import *
 from utils import *
-from objects import Cell, ConveyorBelt, Game, Manipulator, Rock
+from objects import Cell, ConveyorBelt, Game, Manipulator, Rock, add_sound_listener, emit_sound, remove_sound_listener
+from board import SparseField
+from level_index import load_level_index
+from profiling import JsonSink, Profiler, format_report
 from sfx import bg_music_play, bg_music_set_vol, play_sfx, set_sfx_volume
 
 
+add_sound_listener(play_sfx)
+
+VIEWPORT_KEYS = {pygame.K_UP: (-1, 0), pygame.K_RIGHT: (0, 1),
+                 pygame.K_DOWN: (1, 0), pygame.K_LEFT: (0, -1)}
+
+
+@contextmanager
+def collapsed_sounds():
+    '''
+    Sound effects emitted inside are played once each on exit,
+    so that running many commands at once does not fire a sound per command
+    '''
+    names = []
+    remove_sound_listener(play_sfx)
+    add_sound_listener(names.append)
+    try:
+        yield
+    finally:
+        remove_sound_listener(names.append)
+        add_sound_listener(play_sfx)
+        for name in dict.fromkeys(names):
+            play_sfx(name)
+
+
+def next_frame(clock, busy=False):
+    '''
+    Waits for the next frame and returns (time_delta, events). While busy (something is animating
+    or a key is held down) frames come at FRAMERATE; otherwise this blocks until an event arrives
+    or IDLE_WAKEUP_MS pass, so a window nobody interacts with does not spin
+    '''
+    events = []
+    if not busy and not any(pygame.key.get_pressed()):
+        event = pygame.event.wait(IDLE_WAKEUP_MS)
+        if event.type != pygame.NOEVENT:
+            events.append(event)
+    time_delta = clock.tick(FRAMERATE)/1000.0
+    return time_delta, events + pygame.event.get()
+
+
 class UICell(UIButton):
     def __init__(self, relative_rect, cell: Cell, manager, **kwargs):
         self.cell = cell
@@ -21,7 +64,6 @@ class UICell(UIButton):
         self.kwargs = kwargs
         self.object_id = self.get_object_id()
         self.kwargs['object_id'] = self.object_id
-        self.object_id_prev = self.object_id
         super().__init__(relative_rect, self.text, manager, **kwargs)
         rect_group_id = pygame.Rect(0, 0, 0, 0)
         rect_group_id.size = GROUP_ID_TEXTBOX_SIZE
@@ -29,6 +71,7 @@ class UICell(UIButton):
         self.group_id_textbox = UITextBox(
             '', rect_group_id, self.manager, object_id=ObjectID(class_id='@Centered'))
         self.group_id_textbox.hide()
+        self.refresh()
 
     def get_object_id(self):
         # TODO: draw flippers better
@@ -54,11 +97,23 @@ class UICell(UIButton):
                 return '#OTHER'
         return '#EMPTY'
 
+    def set_object_id(self, object_id):
+        '''
+        Re-themes the widget in place, so that a cell keeps its widget when its unit changes
+        (pygame_gui 0.6.4 has no change_object_id)
+        '''
+        self.object_id = object_id
+        self._create_valid_ids(container=self.kwargs.get('container'),
+                               parent_element=self.kwargs.get('parent_element'),
+                               object_id=object_id, element_id='button')
+        self.rebuild_from_changed_theme_data()
+
     def kill(self):
         self.group_id_textbox.kill()
         return super().kill()
 
-    def update(self, time_delta):
+    def refresh(self):
+        # called by FieldPanel when the cell has changed, not every frame
         self.set_text(str(self.cell))
         self.group_id = None if self.cell.contents is None else self.cell.contents.IN_GROUP
         if self.group_id is not None:
@@ -66,15 +121,19 @@ class UICell(UIButton):
             self.group_id_textbox.show()
         else:
             self.group_id_textbox.hide()
-        return super().update(time_delta)
 
 # TODO: redraw
 
 
 class FieldPanel(UIPanel):
-    def __init__(self, manager, field, **kwargs):
+    def __init__(self, manager, field, board_size=BOARD_SIZE, **kwargs):
         self.manager = manager
         self.field = field
+        self.board_size = board_size
+        # only the visible part of a large field gets UICells
+        self.viewport_size = (min(board_size[0], BOARD_SIZE[0]),
+                              min(board_size[1], BOARD_SIZE[1]))
+        self.viewport_origin = (0, 0)
         self.field_panel_rect = pygame.Rect(0, 0, 0, 0)
         self.field_panel_rect.size = (
             ((BOARD_SIZE[1] + 3)*MARGIN + BOARD_SIZE[1]*CELL_SIZE[1]),  (BOARD_SIZE[0] + 3)*MARGIN + BOARD_SIZE[0]*CELL_SIZE[0])
@@ -83,38 +142,71 @@ class FieldPanel(UIPanel):
                          starting_layer_height=0, manager=manager, **kwargs)
         self.create_cells()
 
-    def update_field(self, field):
+    def get_cell(self, i, j):
+        '''
+        Returns the field cell shown at the viewport position (i, j);
+        cells a sparse field has never created are shown as empty ones
+        '''
+        pos = (self.viewport_origin[0] + i, self.viewport_origin[1] + j)
+        if isinstance(self.field, SparseField):
+            cell = self.field.peek(pos)
+            return cell if cell is not None else Cell(pos=pos)
+        return self.field[pos[0]][pos[1]]
+
+    def move_viewport(self, delta):
+        self.viewport_origin = (
+            max(0, min(self.viewport_origin[0] + delta[0],
+                self.board_size[0] - self.viewport_size[0])),
+            max(0, min(self.viewport_origin[1] + delta[1],
+                self.board_size[1] - self.viewport_size[1]))
+        )
+        self.update_field(self.field)
+
+    def update_field(self, field, touched_cells=None):
+        '''
+        Re-renders the UICells of the touched cells (positions on the field, see changes.ChangeLog);
+        all of the visible ones if touched_cells is None
+        '''
         self.field = field
-        for i in range(BOARD_SIZE[0]):
-            for j in range(BOARD_SIZE[1]):
-                if self.cells[i][j].object_id != self.cells[i][j].get_object_id():
-                    self.cells[i][j] = UICell(
-                        self.cells[i][j].relative_rect, field[i][j], self.manager)
+        if touched_cells is None:
+            to_update = [(i, j) for i in range(self.viewport_size[0])
+                         for j in range(self.viewport_size[1])]
+        else:
+            origin = self.viewport_origin
+            to_update = [(pos[0] - origin[0], pos[1] - origin[1]) for pos in touched_cells
+                         if 0 <= pos[0] - origin[0] < self.viewport_size[0]
+                         and 0 <= pos[1] - origin[1] < self.viewport_size[1]]
+        for i, j in to_update:
+            uicell = self.cells[i][j]
+            uicell.cell = self.get_cell(i, j)
+            if uicell.object_id != (object_id := uicell.get_object_id()):
+                uicell.set_object_id(object_id)
+            uicell.refresh()
 
     def disable_uicells(self):
-        for i in range(BOARD_SIZE[0]):
-            for j in range(BOARD_SIZE[1]):
+        for i in range(self.viewport_size[0]):
+            for j in range(self.viewport_size[1]):
                 self.cells[i][j].disable()
 
     def create_cells(self):
         start_x, start_y = (
             self.field_panel_rect.topleft[0] + 2*MARGIN, self.field_panel_rect.topleft[1] + 2*MARGIN)
         self.cells = [[UICell(relative_rect=pygame.Rect((start_x + j*(MARGIN + CELL_SIZE[0]), start_y + i*(MARGIN + CELL_SIZE[1])), CELL_SIZE),
-                              cell=self.field[i][j],
-                              manager=self.manager) for j in range(BOARD_SIZE[1])] for i in range(BOARD_SIZE[0])]
+                              cell=self.get_cell(i, j),
+                              manager=self.manager) for j in range(self.viewport_size[1])] for i in range(self.viewport_size[0])]
 
     def process_event(self, event):
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
             for i, cells_row in enumerate(self.cells):
                 for j, cell in enumerate(cells_row):
                     if event.ui_element == cell:
-                        print(self.field[i][j].contents.describe(
-                        ) if self.field[i][j].contents is not None else f'pos={self.field[i][j].pos} empty cell')
+                        print(cell.cell.contents.describe(
+                        ) if cell.cell.contents is not None else f'pos={cell.cell.pos} empty cell')
         return super().process_event(event)
 
     def kill(self):
-        for i in range(BOARD_SIZE[0]):
-            for j in range(BOARD_SIZE[1]):
+        for i in range(self.viewport_size[0]):
+            for j in range(self.viewport_size[1]):
                 self.cells[i][j].kill()
         return super().kill()
 
@@ -129,9 +221,11 @@ class FieldPanelCreationWindow(FieldPanel):
     def update_field(self):
         for i in range(BOARD_SIZE[0]):
             for j in range(BOARD_SIZE[1]):
-                if self.cells[i][j].object_id != self.cells[i][j].get_object_id():
-                    self.cells[i][j] = UICell(
-                        self.cells[i][j].relative_rect, self.field[i][j], self.manager)
+                uicell = self.cells[i][j]
+                uicell.cell = self.field[i][j]
+                if uicell.object_id != (object_id := uicell.get_object_id()):
+                    uicell.set_object_id(object_id)
+                uicell.refresh()
 
     def process_event(self, event):
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
@@ -141,7 +235,7 @@ class FieldPanelCreationWindow(FieldPanel):
                         if self.cursor is None:
                             print('Nothing in the cursor')
                         else:
-                            cell.cell.contents = self.cursor
+                            cell.cell.set_contents(self.cursor)
                             self.field[i][j] = cell.cell
         return UIPanel.process_event(self, event)
 
@@ -222,14 +316,16 @@ class Gui(Game):
         super().__init__(level_file)
         level_file = os.path.split(level_file)[-1]
         self.ui_manager = ui_manager
+        self.track_changes()
         self.field_panel = FieldPanel(
-            self.ui_manager, self.field)
+            self.ui_manager, self.field, self.board_size)
         self.logs = LogTextBox(self.ui_manager, self.field_panel.rect)
         self.command_input = CommandInput(
             self.ui_manager, self.field_panel.rect)
         self.command_input.focus()
         self.command_feedback = CommandFeedback(
             self.ui_manager, self.field_panel.rect, self.command_input.rect)
+        self.instant_run = None
         self.notifications_shown = SimpleNamespace(
             typos_left=False, typos_eliminated=False)
 
@@ -252,10 +348,118 @@ class Gui(Game):
             (f'{paint("{")}{paint("<br>".join(self.NOTE), "#E19DD9")}{paint("}")}<br>' if self.NOTE else '')
         self.logs.log(self.init_text)
 
+    def is_busy(self):
+        # a running sequence of commands needs frames even without input
+        return self.multiple_cmds_mode.run or self.instant_run is not None
+
+    def start_instant_run(self, commands):
+        '''
+        Executes compiled commands a slice at a time, see run_frame; Esc cancels
+        '''
+        self.instant_run = SimpleNamespace(
+            program=commands, commands=iter(commands), total=len(commands), done=0)
+        self.run_instant_slice()
+
+    def run_instant_slice(self):
+        deadline = perf_counter() + INSTANT_RUN_BUDGET_MS/1000
+        with collapsed_sounds():
+            for command in self.instant_run.commands:
+                self.try_execute_on_group(command)
+                self.instant_run.done += 1
+                if perf_counter() > deadline:
+                    break
+            else:
+                self.finish_instant_run()
+                return
+        self.command_feedback.set_text(
+            f'running: {self.instant_run.done}/{self.instant_run.total} commands (Esc to cancel)')
+
+    def keep_executed_prompt(self, program, executed):
+        '''
+        Replaces the last prompt of the command history, which was cut short after executed
+        of its commands, with a prompt of only those; the history is what a victory saves
+        '''
+        prompt = program.prompt(executed)
+        if prompt:
+            self.command_history[-1] = prompt
+        else:
+            self.command_history.pop()
+
+    def finish_instant_run(self):
+        self.instant_run = None
+        self.command_feedback.set_text('')
+        self.check_victory()
+
+    def run_playback_frame(self):
+        '''
+        Executes the next PLAYBACK_SPEEDS[speed] commands of a playing compiled sequence
+        (never more than fit into INSTANT_RUN_BUDGET_MS); the field is rendered once for all of them.
+        Like stepping with RETURN, the playback stops at a victory
+        '''
+        mode = self.multiple_cmds_mode
+        speed = PLAYBACK_SPEEDS[mode.speed]
+        deadline = perf_counter() + INSTANT_RUN_BUDGET_MS/1000
+        with collapsed_sounds():
+            for executed, command in enumerate(mode.commands.iterate_from(mode.current_cmd_index), 1):
+                self.try_execute_on_group(command)
+                if self.multiple_cmds_mode is not mode:
+                    # an exception has reset the mode
+                    return
+                mode.current_cmd_index += 1
+                if all(self.is_victory()):
+                    self.check_victory()
+                    return
+                if executed == speed or perf_counter() > deadline:
+                    break
+        if mode.current_cmd_index >= len(mode.commands):
+            print('finish')
+            self.finish_multiple_cmds_mode()
+
+    def finish_multiple_cmds_mode(self):
+        self.command_input.focus()
+        self.command_feedback.set_text('')
+        self.reset_multiline_cmds_mode()
+
+    def change_playback_speed(self, delta):
+        self.multiple_cmds_mode.speed = max(
+            0, min(self.multiple_cmds_mode.speed + delta, len(PLAYBACK_SPEEDS) - 1))
+
+    def run_frame(self):
+        '''
+        Called once a frame by GameWindow
+        '''
+        if self.active and self.instant_run is not None:
+            self.run_instant_slice()
+            self.update()
+        elif self.active and self.multiple_cmds_mode.run:
+            self.run_playback_frame()
+            self.update()
+
     def reset_multiline_cmds_mode(self):
         self.multiple_cmds_mode = SimpleNamespace(
-            is_active=False, commands=[], commands_to_display=[],
-            current_cmd_index=0, run=False, last_time=None, DELAY=None)
+            is_active=False, commands=[],
+            current_cmd_index=0, run=False, speed=0)
+
+    def toggle_profiling(self, argument):
+        '''
+        "-profile" starts profiling the commands and, given again, stops it and prints the report
+        to the console; "-profile json" also saves the report to PROFILE_FILE_PATH
+        '''
+        console = paint("CONSOLE", "#FA1041")
+        if self.profiler is None:
+            self.start_profiling(
+                Profiler(JsonSink(PROFILE_FILE_PATH)) if argument == 'json' else None)
+            self.logs.log(f'{console}: profiling started, type "-profile" to stop<br>')
+            return
+        sink = self.profiler.sink
+        report = self.stop_profiling()
+        print('--- PROFILE ---')
+        print(format_report(report))
+        slowest = next(iter(report['commands']), None)
+        self.logs.log(f'{console}: profiling stopped' +
+                      (f', most time spent on "{slowest}"' if slowest else '') +
+                      (f', saved to {sink.path}' if isinstance(sink, JsonSink) else '') +
+                      '; the report has been printed to the console<br>')
 
     def log_warning(self, w):
         self.logs.log(paint(f'{w.__class__.__name__} warning:<br>', '#F0BF0D'))
@@ -277,23 +481,23 @@ class Gui(Game):
             self.execute_on_group(command)
         except Warning as w:
             self.log_warning(w)
-            play_sfx('warning')
+            emit_sound('warning')
         except CustomException as e:
             self.process_exception(e)
-            play_sfx('exception')
+            emit_sound('exception')
 
     def process_event(self, event):
         if self.active:
             shift_mode = pygame.key.get_mods() & pygame.KMOD_SHIFT
             if event.type == pygame.KEYDOWN:
                 if shift_mode:
-                    if not self.multiple_cmds_mode.is_active and event.key == pygame.K_RETURN:
+                    if not self.multiple_cmds_mode.is_active and self.instant_run is None and event.key == pygame.K_RETURN:
                         # compile commands and activate multiple_cmds_mode
                         raw_command = self.command_input.get_text()
                         self.command_history.append(raw_command)
                         self.command_input.set_text('')
                         try:
-                            self.multiple_cmds_mode.commands, self.multiple_cmds_mode.commands_to_display = self.command_handler.get_command_sequence(
+                            self.multiple_cmds_mode.commands = self.command_handler.compile(
                                 raw_command)
                             self.multiple_cmds_mode.is_active = True
                             self.command_input.unfocus()
@@ -303,7 +507,7 @@ class Gui(Game):
                         except CustomException as e:
                             self.process_exception(e)
                 else:
-                    if event.key == pygame.K_RETURN:
+                    if event.key == pygame.K_RETURN and self.instant_run is None:
                         raw_command = self.command_input.get_text()
                         if raw_command.startswith('-'):
                             # run console commands
@@ -330,8 +534,12 @@ class Gui(Game):
                                       self.number_of_commands)
                                 self.logs.log(
                                     f'{paint("CONSOLE", "#FA1041")}: game information has been printed to the console<br>')
+                            elif raw_command.startswith('-profile'):
+                                self.toggle_profiling(
+                                    raw_command[len('-profile'):].strip())
                             elif raw_command == '-clear':
                                 print('clearing')
+                                self.logs.kill()
                                 self.logs = LogTextBox(
                                     self.ui_manager, self.field_panel.rect)
                                 self.logs.log(self.init_text)
@@ -344,10 +552,8 @@ class Gui(Game):
                                 print('instant execution: ', raw_command)
                                 self.command_history.append(raw_command)
                                 try:
-                                    commands_, _ = self.command_handler.get_command_sequence(
-                                        raw_command)
-                                    for cmd_ in commands_:
-                                        self.try_execute_on_group(cmd_)
+                                    self.start_instant_run(
+                                        self.command_handler.compile(raw_command))
                                 except Warning as w:
                                     play_sfx('prompt_warning')
                                     self.log_warning(w)
@@ -361,15 +567,34 @@ class Gui(Game):
                                 self.multiple_cmds_mode.current_cmd_index += 1
                                 if len(self.multiple_cmds_mode.commands) <= self.multiple_cmds_mode.current_cmd_index:
                                     print('end steps')
-                                    self.command_input.focus()
-                                    self.command_feedback.set_text('')
-                                    self.reset_multiline_cmds_mode()
+                                    self.finish_multiple_cmds_mode()
                         self.command_input.set_text('')
+                    elif event.key in VIEWPORT_KEYS and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                        # scroll the visible part of a large field
+                        self.field_panel.move_viewport(
+                            VIEWPORT_KEYS[event.key])
+                    elif self.multiple_cmds_mode.is_active and not self.command_input.is_focused \
+                            and event.key in (pygame.K_SPACE, pygame.K_PLUS, pygame.K_EQUALS, pygame.K_MINUS, pygame.K_KP_PLUS, pygame.K_KP_MINUS):
+                        # playback of the compiled sequence
+                        if event.key == pygame.K_SPACE:
+                            self.multiple_cmds_mode.run = not self.multiple_cmds_mode.run
+                        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                            self.change_playback_speed(-1)
+                        else:
+                            self.change_playback_speed(1)
                     elif event.key == pygame.K_SLASH:
                         self.command_input.focus()
                     elif event.key == pygame.K_ESCAPE:
-                        if self.multiple_cmds_mode.is_active:
+                        if self.instant_run is not None:
+                            self.logs.log(paint(
+                                f'Cancelled after {self.instant_run.done} of {self.instant_run.total} commands<br>', '#F0BF0D'))
+                            self.keep_executed_prompt(
+                                self.instant_run.program, self.instant_run.done)
+                            self.finish_instant_run()
+                        elif self.multiple_cmds_mode.is_active:
                             print('multiline_mode off')
+                            self.keep_executed_prompt(
+                                self.multiple_cmds_mode.commands, self.multiple_cmds_mode.current_cmd_index)
                             self.command_feedback.set_text('')
                             self.reset_multiline_cmds_mode()
                         else:
@@ -380,16 +605,9 @@ class Gui(Game):
                             self.command_input.set_text(
                                 self.command_history[-1])
 
-            word_created, typos_eliminated = self.is_victory()
-            self.victory = word_created and typos_eliminated
-            if not self.notifications_shown.typos_left and word_created and not typos_eliminated:
-                self.logs.log(
-                    paint('There are some typos left!<br>', '#F0BF0D'))
-                self.notifications_shown.typos_left = True
-            if not self.notifications_shown.typos_eliminated and typos_eliminated and self.typos:
-                self.logs.log(paint('No typos (left)!<br>', '#88F07D'))
-                self.notifications_shown.typos_eliminated = True
-                play_sfx('typos_eliminated')
+            # a running instant execution is judged once it is over
+            if self.instant_run is None:
+                self.check_victory()
             self.update()
 
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
@@ -403,52 +621,111 @@ class Gui(Game):
         elif event.type == pygame_gui.UI_BUTTON_START_PRESS:
             play_sfx('cool_click_down')
 
+    def check_victory(self):
+        word_created, typos_eliminated = self.is_victory()
+        self.victory = word_created and typos_eliminated
+        if not self.notifications_shown.typos_left and word_created and not typos_eliminated:
+            self.logs.log(
+                paint('There are some typos left!<br>', '#F0BF0D'))
+            self.notifications_shown.typos_left = True
+        if not self.notifications_shown.typos_eliminated and typos_eliminated and self.typos:
+            self.logs.log(paint('No typos (left)!<br>', '#88F07D'))
+            self.notifications_shown.typos_eliminated = True
+            play_sfx('typos_eliminated')
+
     def update(self):
         if self.victory:
             play_sfx('victory')
+            if self.multiple_cmds_mode.is_active:
+                # the rest of a sequence stopped by the victory never runs
+                self.keep_executed_prompt(
+                    self.multiple_cmds_mode.commands, self.multiple_cmds_mode.current_cmd_index)
             WinMessage(self.ui_manager, self.WORDS, ''.join(
                 self.submitted), command_history=self.command_history, number_of_commands=self.number_of_commands)
             self.command_feedback.set_text('')
             self.command_input.disable()
             self.command_feedback.disable()
-            self.field_panel.update_field(self.field)
+            self.field_panel.update_field(
+                self.field, self.changes.drain()[0])
             # self.field_panel.disable_uicells()
             print('commands:', ' '.join(self.command_history))
             self.active = False
         else:
-            if self.multiple_cmds_mode.run and ((now := time()) - self.multiple_cmds_mode.last_time > self.multiple_cmds_mode.delay):
-                if len(self.multiple_cmds_mode.commands) > self.multiple_cmds_mode.current_cmd_index:
-                    self.multiple_cmds_mode.last_time = now
-                    this_command = self.multiple_cmds_mode.commands[
-                        self.multiple_cmds_mode.current_cmd_index]
-                    self.try_execute_on_group(this_command)
-                    self.multiple_cmds_mode.current_cmd_index += 1
-                else:
-                    print('finish')
-                    self.command_input.focus()
-                    self.command_feedback.set_text('')
-                    self.reset_multiline_cmds_mode()
-            self.field_panel.update_field(self.field)
+            self.field_panel.update_field(
+                self.field, self.changes.drain()[0])
             if self.multiple_cmds_mode.is_active:
+                # only a window of commands around the current one is shown
+                start = max(0, self.multiple_cmds_mode.current_cmd_index -
+                            COMMAND_FEEDBACK_WINDOW//4)
+                commands_to_display = self.multiple_cmds_mode.commands.display(
+                    start, COMMAND_FEEDBACK_WINDOW)
                 to_display = [paint(cmd, '#F0DE4A', size=4.5) if i == self.multiple_cmds_mode.current_cmd_index
-                              else cmd for i, cmd in enumerate(self.multiple_cmds_mode.commands_to_display)]
+                              else cmd for i, cmd in enumerate(commands_to_display, start)]
+                if start > 0:
+                    to_display.insert(0, '...')
+                if start + len(commands_to_display) < len(self.multiple_cmds_mode.commands):
+                    to_display.append('...')
+                if self.multiple_cmds_mode.run:
+                    speed = PLAYBACK_SPEEDS[self.multiple_cmds_mode.speed]
+                    to_display.insert(0, paint(
+                        f'[playing: {"max" if speed is None else speed} per frame]', '#17D36A'))
                 self.command_feedback.set_text(' '.join(to_display))
 
 
 class PickLevelButton(UIButton):
-    def __init__(self, relative_rect, manager, button_text, filename, text_box_text, *args, **kwargs):
+    def __init__(self, relative_rect, manager, *args, **kwargs):
         button_rect = pygame.Rect(
             relative_rect.topleft, (relative_rect.width, relative_rect.height*0.6))
         text_box_rect = pygame.Rect(
             button_rect.bottomleft, (relative_rect.width, relative_rect.height*0.4))
+        self.level_filename = None
+        self.metadata = None
+        super().__init__(button_rect, '', manager, *args, **kwargs)
+        self.textbox = UITextBox('', text_box_rect, manager)
+
+    def show_level(self, filename, metadata, level_data_dict):
+        # the buttons of a page are reused for every page
         self.level_filename = filename
-        super().__init__(button_rect, button_text, manager, tool_tip_text=filename)
-        self.textbox = UITextBox(text_box_text, text_box_rect, manager)
+        self.metadata = metadata
+        self.set_text(f'Level {metadata["number"]}')
+        self.update_badge(level_data_dict)
+        self.show()
+        self.textbox.show()
+
+    def hide_level(self):
+        self.level_filename = None
+        self.metadata = None
+        self.hide()
+        self.textbox.hide()
+
+    def update_badge(self, level_data_dict):
+        if level_data_dict:
+            tb_list = []
+            tooltip_list = []
+            for word, word_data in level_data_dict.items():
+                tb_list.append(
+                    paint(word_data["num_of_cmds"], color="#0FFF0F"))
+                tooltip_list.append(word)
+            self.tool_tip_text = '|'.join(tooltip_list)
+            tb_text = 'sol: ' + '|'.join(tb_list)
+        elif self.metadata['error']:
+            self.tool_tip_text = self.metadata['error']
+            tb_text = paint('broken', color='#FF3F3F')
+        else:
+            self.tool_tip_text = f'{self.metadata["name"] or self.level_filename}<br>words: {" ".join(self.metadata["words"] or ["-"])}'
+            tb_text = paint('no solution', color='#707070')
+        self.textbox.set_text(tb_text)
 
 
 class LevelButtonsPanel(UIPanel):
-    def __init__(self, manager, level_filenames, **kwargs):
-        self.level_filenames = level_filenames
+    '''
+    Shows the levels a page at a time; the widgets of one page are created once
+    and re-labelled when the page changes, so the number of levels does not matter
+    '''
+
+    def __init__(self, manager, level_index, **kwargs):
+        self.level_index = level_index
+        self.level_filenames = list(level_index)
         # self.progress = progress
         self.panel_rect = pygame.Rect((0, 0, 0, 0))
         self.panel_rect.topleft = (MARGIN, MARGIN)
@@ -459,50 +736,95 @@ class LevelButtonsPanel(UIPanel):
         super().__init__(self.panel_rect, starting_layer_height=0,
                          manager=self.manager, **kwargs)
         self.progress_data_dict = load_progress_data()
+        # the last row of the grid holds the page controls
+        self.page_size = LEVELS_GRID_SIZE[0]*(LEVELS_GRID_SIZE[1] - 1)
+        self.number_of_pages = max(
+            1, -(-len(self.level_filenames)//self.page_size))
+        self.page = 0
+        self.selected = 0
         self.create_buttons()
+        self.show_page(0)
 
     def create_buttons(self):
-        amount = len(self.level_filenames)
         start_x, start_y = (
             self.panel_rect.topleft[0] + 2*MARGIN, self.panel_rect.topleft[1] + 2*MARGIN)
-        self.buttons: list[PickLevelButton] = []
-        for k in range(amount):
-            j = k % LEVELS_GRID_SIZE[0]
-            i = k // LEVELS_GRID_SIZE[0]
-            button_text = f'Level {get_level_number_from_filename(self.level_filenames[k])}'
-            self.buttons.append(PickLevelButton(relative_rect=pygame.Rect((start_x + j*(MARGIN + self.button_size[0]), start_y + i*(MARGIN + self.button_size[1])),
-                                self.button_size), manager=self.manager, button_text=button_text, filename=self.level_filenames[k], text_box_text=''))
-            self.update_textbox_fields()
-
-    def update_textbox_fields(self):
-        for btn in self.buttons:
-            level_data_dict = self.progress_data_dict.get(btn.level_filename)
-            if level_data_dict:
-                tb_list = []
-                tooltip_list = []
-                for word, word_data in level_data_dict.items():
-                    tb_list.append(
-                        paint(word_data["num_of_cmds"], color="#0FFF0F"))
-                    tooltip_list.append(word)
-                btn.tool_tip_text = '|'.join(tooltip_list)
-                tb_text = 'sol: ' + '|'.join(tb_list)
+
+        def grid_rect(i, j, width=1):
+            return pygame.Rect((start_x + j*(MARGIN + self.button_size[0]), start_y + i*(MARGIN + self.button_size[1])),
+                               (width*self.button_size[0] + (width - 1)*MARGIN, self.button_size[1]))
+
+        self.buttons: list[PickLevelButton] = [
+            PickLevelButton(relative_rect=grid_rect(k // LEVELS_GRID_SIZE[0], k % LEVELS_GRID_SIZE[0]),
+                            manager=self.manager)
+            for k in range(self.page_size)]
+        last_row = LEVELS_GRID_SIZE[1] - 1
+        self.previous_page_button = UIButton(
+            grid_rect(last_row, 0), '<', self.manager, tool_tip_text='previous page (PageUp)')
+        self.page_label = UITextBox(
+            '', grid_rect(last_row, 1, LEVELS_GRID_SIZE[0] - 2), self.manager, object_id=ObjectID(class_id='@Centered'))
+        self.next_page_button = UIButton(
+            grid_rect(last_row, LEVELS_GRID_SIZE[0] - 1), '>', self.manager, tool_tip_text='next page (PageDown)')
+
+    def show_page(self, page):
+        self.page = max(0, min(page, self.number_of_pages - 1))
+        first = self.page*self.page_size
+        for k, btn in enumerate(self.buttons):
+            if first + k < len(self.level_filenames):
+                filename = self.level_filenames[first + k]
+                btn.show_level(
+                    filename, self.level_index[filename], self.progress_data_dict.get(filename))
             else:
-                tb_text = paint('no solution', color='#707070')
-            btn.textbox.set_text(tb_text)
+                btn.hide_level()
+            btn.unselect()
+        if self.level_filenames:
+            # the selection follows the page, keeping its place in the grid
+            self.selected = min(first + self.selected % self.page_size,
+                                len(self.level_filenames) - 1)
+            self.button_of(self.selected).select()
+        self.page_label.set_text(
+            f'page {self.page + 1}/{self.number_of_pages}, levels {first + 1}-{min(first + self.page_size, len(self.level_filenames))} of {len(self.level_filenames)}')
+
+    def button_of(self, level_index):
+        # the button showing the level or None if the level is on another page
+        k = level_index - self.page*self.page_size
+        return self.buttons[k] if 0 <= k < self.page_size else None
+
+    def select_level(self, level_index):
+        '''
+        Selects the level's button, turning the page if needed
+        '''
+        if (btn := self.button_of(self.selected)) is not None:
+            btn.unselect()
+        self.selected = level_index
+        if self.button_of(level_index) is None:
+            # show_page selects the button in the same place of the new page
+            self.show_page(level_index//self.page_size)
+        else:
+            self.button_of(level_index).select()
+
+    def open_level(self, filename):
+        solution = GameWindow(level_file=PurePath(LEVELS_DIR, filename))
+        if solution:
+            print('sol:', solution)
+            update_solution(self.progress_data_dict, filename, *solution)
+            self.update_badge(filename)
+        pygame.display.set_caption('Pick a level...')
+
+    def update_badge(self, filename):
+        for btn in self.buttons:
+            if btn.level_filename == filename:
+                btn.update_badge(self.progress_data_dict.get(filename))
 
     def process_event(self, event):
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
-            for i, btn in enumerate(self.buttons):
+            if event.ui_element == self.previous_page_button:
+                self.show_page(self.page - 1)
+            elif event.ui_element == self.next_page_button:
+                self.show_page(self.page + 1)
+            for btn in self.buttons:
                 if event.ui_element == btn:
-                    self.opened_level = self.level_filenames[i]
-                    solution = GameWindow(
-                        level_file=PurePath(LEVELS_DIR, self.opened_level))
-                    if solution:
-                        print('sol:', solution)
-                        update_solution(self.progress_data_dict,
-                                        self.opened_level, *solution)
-                        self.update_textbox_fields()
-                    pygame.display.set_caption('Pick a level...')
+                    self.opened_level = btn.level_filename
+                    self.open_level(self.opened_level)
         return super().process_event(event)
 
 
@@ -563,68 +885,37 @@ class SettingsPanel(UIPanel):
 
 class LevelPicker():
     def __init__(self, manager, background, window_surface):
-        self.level_filenames = load_level_filenames()
+        # the metadata of the levels, so that listing them does not parse them
+        self.level_index = load_level_index()
+        self.level_filenames = list(self.level_index)
         self.manager = manager
         self.background = background
         self.window_surface = window_surface
         self.level_buttons_panel = LevelButtonsPanel(
-            self.manager, self.level_filenames)
+            self.manager, self.level_index)
         self.settings_panel = SettingsPanel(
             self.manager, self.level_buttons_panel.panel_rect)
-        self.chosen_button_index = 0
-        self.chosen_button_index_prev = 0
 
     def process_event(self, event):
         if event.type == pygame.KEYDOWN:
+            panel = self.level_buttons_panel
             if event.key == pygame.K_r:
                 from random import choice
-                this_level = choice(self.level_filenames)
-                solution = GameWindow(
-                    level_file=PurePath(LEVELS_DIR, this_level))
-                if solution:
-                    print('sol:', solution)
-                pygame.display.set_caption('Pick a level...')
+                panel.open_level(choice(self.level_filenames))
             elif event.key == pygame.K_RETURN:
-                print(
-                    'selected:', self.level_buttons_panel.buttons[self.chosen_button_index].text)
-                this_level = self.level_buttons_panel.level_filenames[self.chosen_button_index]
-                solution = GameWindow(
-                    level_file=PurePath(LEVELS_DIR, this_level))
-                if solution:
-                    print('sol:', solution)
-                pygame.display.set_caption('Pick a level...')
-            elif event.key == pygame.K_UP and self.chosen_button_index - LEVELS_GRID_SIZE[0] >= 0:
-                self.chosen_button_index_prev = self.chosen_button_index
-                self.level_buttons_panel.buttons[self.chosen_button_index].unselect(
-                )
-                self.chosen_button_index -= LEVELS_GRID_SIZE[0]
-                # self.chosen_button_index %= LEVELS_GRID_SIZE[1]
-                self.level_buttons_panel.buttons[self.chosen_button_index].select(
-                )
-            elif event.key == pygame.K_RIGHT and self.chosen_button_index < len(self.level_buttons_panel.buttons) - 1:
-                self.chosen_button_index_prev = self.chosen_button_index
-                self.level_buttons_panel.buttons[self.chosen_button_index].unselect(
-                )
-                self.chosen_button_index += 1
-                # self.chosen_button_index %= LEVELS_GRID_SIZE[0]
-                self.level_buttons_panel.buttons[self.chosen_button_index].select(
-                )
-            elif event.key == pygame.K_DOWN and self.chosen_button_index + LEVELS_GRID_SIZE[0] < len(self.level_buttons_panel.buttons):
-                self.chosen_button_index_prev = self.chosen_button_index
-                self.level_buttons_panel.buttons[self.chosen_button_index].unselect(
-                )
-                self.chosen_button_index += LEVELS_GRID_SIZE[0]
-                # self.chosen_button_index %= LEVELS_GRID_SIZE[1]
-                self.level_buttons_panel.buttons[self.chosen_button_index].select(
-                )
-            elif event.key == pygame.K_LEFT and self.chosen_button_index > 0:
-                self.chosen_button_index_prev = self.chosen_button_index
-                self.level_buttons_panel.buttons[self.chosen_button_index].unselect(
-                )
-                self.chosen_button_index -= 1
-                # self.chosen_button_index %= LEVELS_GRID_SIZE[0]
-                self.level_buttons_panel.buttons[self.chosen_button_index].select(
-                )
+                this_level = self.level_filenames[panel.selected]
+                print('selected:', this_level)
+                panel.open_level(this_level)
+            elif event.key == pygame.K_PAGEUP:
+                panel.show_page(panel.page - 1)
+            elif event.key == pygame.K_PAGEDOWN:
+                panel.show_page(panel.page + 1)
+            elif event.key in VIEWPORT_KEYS:
+                delta_i, delta_j = VIEWPORT_KEYS[event.key]
+                new_selected = panel.selected + \
+                    delta_i*LEVELS_GRID_SIZE[0] + delta_j
+                if 0 <= new_selected < len(self.level_filenames):
+                    panel.select_level(new_selected)
 
 
 def GameWindow(level_file):
@@ -650,13 +941,16 @@ def GameWindow(level_file):
             f'{e.__class__.__name__} exception:<br>[{e}]', '#FF0F0F'), manager)
 
     while game.is_running:
-        time_delta = clock.tick(FRAMERATE)/1000.0
-        for event in pygame.event.get():
+        time_delta, events = next_frame(
+            clock, busy=not exception_caught and game.is_busy())
+        for event in events:
             if event.type == pygame.QUIT:
                 game.is_running = False
             if not exception_caught:
                 game.process_event(event)
             manager.process_events(event)
+        if not exception_caught:
+            game.run_frame()
         manager.update(time_delta)
         window_surface.blit(background, (0, 0))
         manager.draw_ui(window_surface)
@@ -680,8 +974,8 @@ def LevelCreationWindow():
 
     is_running = True
     while is_running:
-        time_delta = clock.tick(FRAMERATE)/1000.0
-        for event in pygame.event.get():
+        time_delta, events = next_frame(clock)
+        for event in events:
             if event.type == pygame.QUIT:
                 is_running = False
             manager.process_events(event)
@@ -743,8 +1037,8 @@ def LevelPickerWindow():
 
     is_running = True
     while is_running:
-        time_delta = clock.tick(FRAMERATE)/1000.0
-        for event in pygame.event.get():
+        time_delta, events = next_frame(clock)
+        for event in events:
             if event.type == pygame.QUIT:
                 is_running = False
             manager.process_events(event)
@@ -772,8 +1066,8 @@ def MenuWindow():
 
     is_running = True
     while is_running:
-        time_delta = clock.tick(FRAMERATE)/1000.0
-        for event in pygame.event.get():
+        time_delta, events = next_frame(clock)
+        for event in events:
             if event.type == pygame.QUIT:
                 is_running = False
             elif event.type == pygame.KEYDOWN:
@@ -0,0 +1,56 @@
+import pickle
+from hashlib import sha256
+from pathlib import Path
+
+from level_parser import parse_level
+from utils import LEVEL_CACHE_DIR, write_file_atomically
+
+
+# bump whenever the layout or the checks of a level spec change so that old cache files are ignored
+LEVEL_SPEC_VERSION = 3
+
+# specs loaded by this process, by content hash
+loaded_specs = {}
+
+
+def level_cache_path(digest):
+    return Path(LEVEL_CACHE_DIR, f'{digest}.pickle')
+
+
+def level_digest(level_file):
+    digest = sha256(LEVEL_SPEC_VERSION.to_bytes(4, 'little'))
+    with open(level_file, 'rb') as f:
+        while chunk := f.read(1 << 16):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_level_spec(level_file, digest=None):
+    '''
+    Returns the spec of a level file. Specs are cached on disk by the hash of the file contents,
+    so a level is only parsed the first time it is seen; later a single binary read loads it.
+    digest is level_digest(level_file) if the caller already knows it.
+    The returned spec is shared and must not be modified
+    '''
+    if digest is None:
+        digest = level_digest(level_file)
+    if digest in loaded_specs:
+        return loaded_specs[digest]
+    cache_path = level_cache_path(digest)
+    try:
+        spec = pickle.loads(cache_path.read_bytes())
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        with open(level_file) as f:
+            spec = parse_level(f)
+        store_level_spec(cache_path, spec)
+    loaded_specs[digest] = spec
+    return spec
+
+
+def store_level_spec(cache_path: Path, spec):
+    try:
+        write_file_atomically(cache_path, pickle.dumps(
+            spec, protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        # a read-only installation just goes without the cache
+        pass
@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+from collections import Counter
+from hashlib import sha256
+from pathlib import Path
+
+from exceptions import LevelCreationError
+from level_cache import LEVEL_SPEC_VERSION, level_digest, load_level_spec
+from utils import CONTROLLABLE_UNITS, LEVEL_INDEX_DIR, LEVELS_DIR, get_level_number_from_filename, is_level_filename, level_sort_key, write_file_atomically
+
+
+# bump whenever the fields of an entry change so that old index files are rebuilt
+LEVEL_INDEX_VERSION = 2
+
+
+def level_index_path(levels_dir):
+    # one index per levels directory
+    key = sha256(os.path.abspath(levels_dir).encode()).hexdigest()[:16]
+    return Path(LEVEL_INDEX_DIR, f'{key}.json')
+
+
+def level_metadata(level_file, digest) -> dict:
+    '''
+    The index entry of a level; a level which fails to load (or to be read) gets its error instead of the counts
+    '''
+    entry = {'number': get_level_number_from_filename(Path(level_file).name), 'digest': digest,
+             'name': '', 'words': None, 'letters': None, 'board_size': None,
+             'units': {}, 'groups': 0, 'error': None}
+    try:
+        spec = load_level_spec(level_file, digest)
+    except (LevelCreationError, UnicodeDecodeError, OSError) as e:
+        entry['error'] = f'{e.__class__.__name__}: {e}'
+        return entry
+    # a controllable unit outside of the groups of the file gets a group of its own
+    grouped = {unit_id for group in spec.groups for unit_id in group}
+    implicit_groups = sum(1 for unit_id, (unit_name, _, _) in enumerate(spec.units)
+                          if unit_name.lower() in CONTROLLABLE_UNITS and unit_id not in grouped)
+    entry.update(name=spec.name, words=spec.words, letters=spec.letters,
+                 board_size=list(spec.board_size), groups=len(spec.groups) + implicit_groups,
+                 units=dict(Counter(unit_name for unit_name, _, _ in spec.units)))
+    return entry
+
+
+def load_level_index(levels_dir=LEVELS_DIR) -> dict:
+    '''
+    Returns {filename: entry} for the levels of levels_dir in the order of the level picker.
+    An entry holds the number, the @ name, words, letters, board_size, units (count per unit name),
+    groups (their number, the implicit ones of single units included), digest (the hash of the contents) and error (None if the level loads).
+    The index is kept on disk and a level is only read again if its mtime or size changed
+    '''
+    index_path = level_index_path(levels_dir)
+    try:
+        stored = json.loads(index_path.read_text())
+        if stored['version'] != [LEVEL_INDEX_VERSION, LEVEL_SPEC_VERSION]:
+            stored = {}
+        stored = stored.get('levels', {})
+    except (OSError, ValueError, KeyError):
+        stored = {}
+    index = {}
+    changed = False
+    with os.scandir(levels_dir) as entries:
+        files = sorted((entry for entry in entries if is_level_filename(entry.name)),
+                       key=lambda entry: level_sort_key(entry.name))
+    for file in files:
+        stat = file.stat()
+        entry = stored.get(file.name)
+        if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            entry = level_metadata(file.path, level_digest(file.path))
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            changed = True
+        index[file.name] = entry
+    if changed or len(index) != len(stored):
+        store_level_index(index_path, index)
+    return index
+
+
+def store_level_index(index_path: Path, index):
+    # like the level spec cache, a failed write is ignored
+    try:
+        write_file_atomically(index_path, json.dumps(
+            {'version': [LEVEL_INDEX_VERSION, LEVEL_SPEC_VERSION], 'levels': index}))
+    except OSError:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='List the levels with their metadata, updating the level index')
+    parser.add_argument('--levels-dir', default=LEVELS_DIR)
+    args = parser.parse_args()
+    for filename, entry in load_level_index(args.levels_dir).items():
+        if entry['error']:
+            print(f'{filename:<16} {entry["error"]}')
+            continue
+        units = ', '.join(f'{count} {unit_name}' for unit_name,
+                          count in sorted(entry['units'].items()))
+        print(f'{filename:<16} {entry["name"] or "-":<24} words {" ".join(entry["words"] or ["-"]):<16} '
+              f'groups {entry["groups"]:<3} {units}')
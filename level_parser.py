@@ -0,0 +1,124 @@
+import re
+from string import digits
+from types import SimpleNamespace
+
+from exceptions import (GroupOfDifferentTypes, InvalidGroupMember, InvalidUnitArgument,
+                        NonExistingGroupMember, SubmitterNotFound, UnitOutsideOfField, UnknownUnit,
+                        WordsNotSpecified)
+from utils import BOARD_SIZE, inside_borders
+
+
+UNIT_NAMES = frozenset({'Manipulator', 'ConveyorBelt', 'Stack', 'Rock', 'Flipper', 'Portal',
+                        'Card', 'Piston', 'Anvil', 'Typo', 'InitStack', 'Submitter'})
+
+patterns = {
+    'unit': re.compile(r'^(\d+ \d+) (\w+)( .+)?'),
+    'size': re.compile(r'^size: ?\{(\d+) (\d+)\}'),
+    'groups': re.compile(r'^groups?: ?\{([\[\] ,\d]+)\}'),
+    'words': re.compile(r'^words?: ?\{([A-Z .]+)\}'),
+    'letters': re.compile(r'^letters?: ?\{([A-Z.]+)\}'),
+    'note': re.compile(r'^# ?(.*)'),
+    'name': re.compile(r'^@ ?(.*)')
+}
+pattern_integer_value = re.compile(r'(\w+)=(\w+)')
+pattern_str_value = re.compile(r"(\w+)='(\w+)'")
+pattern_word = re.compile(r'\S+')
+
+# every kind of line is told apart by its first character, so a line is matched only once
+line_kinds = {'#': 'note', '@': 'name', 's': 'size', 'g': 'groups', 'w': 'words', 'l': 'letters',
+              **{digit: 'unit' for digit in digits}}
+
+
+def parse_level(lines):
+    '''
+    Turns the lines of a .wf file (any iterable, e.g. an open file) into a level spec:
+    plain data from which Game builds its units.
+        units -- list of (unit_name, pos, kwargs) in the order of unit ids
+        groups -- list of lists of unit ids
+        words, letters, note, name, board_size
+    words and letters are None if the file does not specify them; lines which match nothing are ignored.
+    Raises UnknownUnit, InvalidUnitArgument, InvalidGroupMember, GroupOfDifferentTypes,
+    NonExistingGroupMember and UnitOutsideOfField with the line and column;
+    SubmitterNotFound and WordsNotSpecified for a level without a Submitter or words
+    '''
+    spec = SimpleNamespace(units=[], groups=[], words=None, letters=None,
+                           note=[], name='', board_size=BOARD_SIZE)
+    # (line, column) of every group, to check them once all units are known
+    group_locations = []
+    # the line of every unit, to check its position once the size is known
+    unit_lines = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        kind = line_kinds.get(line[:1])
+        if kind is None or not (match := patterns[kind].match(line)):
+            continue
+        if kind == 'unit':
+            position_str, unit_name, kwargs_str = match.groups()
+            if unit_name not in UNIT_NAMES:
+                raise UnknownUnit(
+                    f'Unknown unit "{unit_name}"', line_number, match.start(2) + 1)
+            pos = tuple(map(int, position_str.split()))
+            kwargs = dict()
+            if kwargs_str is not None:
+                for match_word in pattern_word.finditer(line, match.start(3)):
+                    kw = match_word.group()
+                    if match_kw := pattern_integer_value.match(kw):
+                        key_, val_ = match_kw.groups()
+                        if not val_.isdecimal():
+                            raise InvalidUnitArgument(
+                                f'{key_}={val_} is neither an integer nor a quoted string',
+                                line_number, match_word.start() + match_kw.start(2) + 1)
+                        kwargs[key_] = int(val_)
+                    elif match_kw := pattern_str_value.match(kw):
+                        key_, val_ = match_kw.groups()
+                        kwargs[key_] = val_
+            spec.units.append((unit_name, pos, kwargs))
+            unit_lines.append(line_number)
+        elif kind == 'groups':
+            column = match.start(1) + 1
+            for group_str in match.group(1).split(','):
+                group = []
+                for member in pattern_word.finditer(group_str):
+                    if not member.group().isdecimal():
+                        raise InvalidGroupMember(
+                            f'Group member "{member.group()}" is not a unit id',
+                            line_number, column + member.start())
+                    group.append(int(member.group()))
+                spec.groups.append(group)
+                group_locations.append(
+                    (line_number, column + len(group_str) - len(group_str.lstrip())))
+                column += len(group_str) + 1
+        elif kind == 'size':
+            spec.board_size = tuple(map(int, match.groups()))
+        elif kind == 'words':
+            spec.words = match.group(1).split()
+        elif kind == 'letters':
+            spec.letters = match.group(1)
+        elif kind == 'note':
+            spec.note.append(match.group(1))
+        elif kind == 'name':
+            spec.name = match.group(1)
+    for group, (line_number, column) in zip(spec.groups, group_locations):
+        check_group(spec.units, group, line_number, column)
+    for (unit_name, pos, _), line_number in zip(spec.units, unit_lines):
+        if not inside_borders(pos, spec.board_size):
+            raise UnitOutsideOfField(
+                f'Unit {unit_name} at {pos} is outside of the {spec.board_size[0]}x{spec.board_size[1]} field',
+                line_number, 1)
+    if not any(unit_name == 'Submitter' for unit_name, _, _ in spec.units):
+        raise SubmitterNotFound('There must be at least one submitter')
+    if spec.words is None:
+        raise WordsNotSpecified('To create a level give a list of words')
+    return spec
+
+
+def check_group(units, group, line_number, column):
+    for unit_id in group:
+        if unit_id >= len(units):
+            raise NonExistingGroupMember(
+                f'Group {group} refers to unit {unit_id} which does not exist', line_number, column)
+    unit_names = {units[unit_id][0] for unit_id in group}
+    if len(unit_names) != 1:
+        raise GroupOfDifferentTypes(
+            f'Group {group} contains units of different types ({", ".join(sorted(unit_names))})',
+            line_number, column)
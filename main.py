@@ -1,8 +1,9 @@
 from gui import LevelPickerWindow
-from sfx import play_bg_music
+from sfx import play_bg_music, prefetch_sfx
 
 
 play_bg_music()
+prefetch_sfx()
 
 
 def main():
@@ -2,15 +2,41 @@ from types import SimpleNamespace
 from typing import List, Tuple
 from exceptions import *
 from utils import *
-import re
-from copy import deepcopy
 from command_handler import CommandHandler
-from pygame import mixer
+from board import BoardLayout, CompactBoard, SparseField, NO_NEIGHBOUR, cell_index, neighbour_table
+from zobrist import StateHash, compute_state_hash
+from changes import ChangeLog
+from profiling import Profiler
+from level_cache import load_level_spec
+from goals import Goals
+from status_codes import *
 import os
-from sfx import play_sfx
+
+
+sound_listeners = []
+
+
+def add_sound_listener(listener):
+    '''
+    Registers a callable which receives the name of every sound effect the engine emits;
+    the engine itself never touches audio, so headless games have no listeners at all
+    '''
+    sound_listeners.append(listener)
+
+
+def remove_sound_listener(listener):
+    if listener in sound_listeners:
+        sound_listeners.remove(listener)
+
+
+def emit_sound(name):
+    for listener in sound_listeners:
+        listener(name)
 
 
 class Unit:
+    state_hash: StateHash = None
+
     def __init__(self, id, pos, TYPE, IN_GROUP=None,
                  IS_MOVABLE=True, IS_STACKABLE=True, IS_CONTROLLABLE=False,
                  IS_COUPLED=False, IS_CONTAINER=False, is_active=True):
@@ -25,6 +51,17 @@ class Unit:
         self.IS_CONTAINER = IS_CONTAINER
         self.is_active = is_active
 
+    def set_state(self, name, value):
+        '''
+        Sets one of the HASHED_ATTRIBUTES; the commands change them only through here
+        so that a hashed game keeps its state hash up to date
+        '''
+        state_hash = self.state_hash
+        if state_hash is not None:
+            state_hash.toggle_attribute(self, name, getattr(self, name))
+            state_hash.toggle_attribute(self, name, value)
+        setattr(self, name, value)
+
     def describe(self):
         return f'id={self.id} group_id={self.IN_GROUP} pos={self.pos} type={self.TYPE} controllable={self.IS_CONTROLLABLE} is_active={self.is_active} object={self}'
 
@@ -41,17 +78,17 @@ class Container(Unit):
     def get_object(self):
         if not self.is_empty():
             tmp = self.holds
-            self.holds = None
-            return tmp
+            self.set_state('holds', None)
+            return OK, tmp
         # if self.IS_MOVABLE:
         #     return self
 
     def put_object(self, obj: Unit):
         if self.is_empty():
             obj.pos = None
-            self.holds = obj
-        else:
-            raise OccupiedContainer
+            self.set_state('holds', obj)
+            return OK
+        return OCCUPIED_CONTAINER
 
 
 class Coupled(Container):
@@ -63,10 +100,22 @@ class Coupled(Container):
 
 
 class Cell:
-    def __init__(self, pos, contents: Unit = None):
+    def __init__(self, pos, contents: Unit = None, pending_cells: set = None, state_hash: StateHash = None):
         self.pos = pos
+        self.state_hash = state_hash
         self.contents = contents
         self.pending = None
+        # shared set of the field's cells which have a pending unit
+        self.pending_cells = pending_cells
+
+    def set_contents(self, unit):
+        '''
+        Replaces the unit in the cell; like Unit.set_state it keeps the state hash up to date
+        '''
+        if self.state_hash is not None:
+            self.state_hash.toggle_cell(self.pos, self.contents)
+            self.state_hash.toggle_cell(self.pos, unit)
+        self.contents = unit
 
     def __str__(self):
         if self.contents is None:
@@ -74,47 +123,58 @@ class Cell:
         return str(self.contents)
 
     def push(self):
+        '''
+        Moves the pending unit into the cell; returns the status
+        '''
         if self.pending is not None:
             if self.contents is None:
-                self.contents = self.pending
+                self.set_contents(self.pending)
                 self.pending = None
             else:
                 if isinstance(self.pending, Anvil):
                     # destroying units with an Anvil
                     if isinstance(self.contents, Submitter):
-                        raise CrushingSubmitter('Nice try looser hahahahaah')
-                    self.contents.is_active = False
+                        return CRUSHING_SUBMITTER
+                    self.contents.set_state('is_active', False)
                     if isinstance(self.contents, Portal):
                         self.contents.deactivate_couple()
                     if isinstance(self.contents, Typo):
                         self.contents.eliminate()
-                    play_sfx('anvil')
-                    self.contents = self.pending
+                    emit_sound('anvil')
+                    self.set_contents(self.pending)
                     self.pending = None
                 elif isinstance(self.contents, Container):
-                    self.contents.put_object(self.pending)
+                    status = self.contents.put_object(self.pending)
+                    if status:
+                        return status
                     self.pending = None
                     # TODO: need to clear pending
                 else:
-                    raise OccupiedCell
+                    return OCCUPIED_CELL
             self.contents.pos = self.pos
+        return OK
 
     def take(self):
+        '''
+        Returns the status and the unit taken out of the cell (or out of the container in it)
+        '''
         if self.contents is None:
-            raise EmptyCell
+            return EMPTY_CELL, None
         if isinstance(self.contents, Container) and not self.contents.is_empty():
             return self.contents.get_object()
         if self.contents.IS_MOVABLE:
             # this means the object is inside of a container and cannot be controlled
             self.contents.pos = None
             tmp = self.contents
-            self.contents = None
-            return tmp
+            self.set_contents(None)
+            return OK, tmp
         else:
-            raise ImmovableUnit(f'Unit {self.contents.TYPE} is immovable')
+            return IMMOVABLE_UNIT, None
 
     def put(self, obj):
         self.pending = obj
+        if self.pending_cells is not None:
+            self.pending_cells.add(self)
 
 
 class Game:
@@ -128,32 +188,221 @@ class Game:
         self.NOTE = []
         self.NAME = ''
         self.is_running = True
+        self.board_size = BOARD_SIZE
+        self.changes = None
+        self.profiler = None
+        # the state is hashed only once asked for, see hash_state
+        self.state_hash = None
+        # which units have which part of the state in a CompactBoard, see snapshot
+        self.layout = None
+        # the details of the last failure, for its message
+        self.failure_details = ()
 
-        self.create_empty_field()
         self.load_objects_from_txt(level_file)
+        self.create_empty_field()
         self.fill_field()
         self.active = True
         self.command_handler = CommandHandler()
         self.command_history = []
 
     def is_victory(self):
-        return (''.join(self.submitted) in self.WORDS, all([typo.eliminated for typo in self.typos]))
+        return (self.goals.word_created(), not self.goals.typos_left)
+
+    def status(self) -> str:
+        '''
+        goals.WON, goals.POSSIBLE or goals.DEAD once the submitted letters are not a prefix of any word
+        '''
+        return self.goals.status()
 
     def create_empty_field(self):
-        self.field: List[List[Cell]] = [[Cell(pos=(i, j)) for j in range(BOARD_SIZE[1])]
-                                        for i in range(BOARD_SIZE[0])]
+        self.pending_cells = set()
+        if self.board_size[0]*self.board_size[1] > SPARSE_FIELD_MIN_CELLS:
+            self.field = SparseField(self.board_size, self.new_cell)
+            self.cells = None
+            self.neighbours = None
+            return
+        self.field: List[List[Cell]] = [[self.new_cell((i, j)) for j in range(self.board_size[1])]
+                                        for i in range(self.board_size[0])]
+        # the same cells in row-major order, indexed like the neighbour table
+        self.cells: List[Cell] = [cell for row in self.field for cell in row]
+        self.neighbours = neighbour_table(self.board_size)
+
+    def new_cell(self, pos):
+        return Cell(pos=pos, pending_cells=self.pending_cells, state_hash=self.state_hash)
+
+    def is_sparse(self):
+        return self.cells is None
+
+    def neighbour_cell(self, pos, direction, create=False):
+        '''
+        Returns the cell adjacent to pos in the given direction or None if it is outside of the field.
+        A sparse field only creates the cell when a unit is about to be put into it (create);
+        for reads a cell it has never created is returned as an empty cell which is not kept
+        '''
+        if self.neighbours is None:
+            delta = DIRECTIONS[direction]
+            position = (pos[0] + delta[0], pos[1] + delta[1])
+            if not inside_borders(position, self.board_size):
+                return None
+            if create:
+                return self.field.cell(cell_index(position, self.board_size))
+            cell = self.field.peek(position)
+            return cell if cell is not None else Cell(pos=position)
+        index = self.neighbours[cell_index(pos, self.board_size)*4 + direction]
+        if index == NO_NEIGHBOUR:
+            return None
+        return self.cells[index]
+
+    def peek_cell(self, pos):
+        '''
+        Returns the cell at pos or None if a sparse field has never created it
+        '''
+        if self.is_sparse():
+            return self.field.peek(pos)
+        return self.field[pos[0]][pos[1]]
+
+    def occupied_cells(self):
+        '''
+        Yields (index, cell) pairs of the cells holding a unit
+        '''
+        cells = self.field.cells.items() if self.is_sparse() else enumerate(self.cells)
+        return ((index, cell) for index, cell in cells if cell.contents is not None)
+
+    def hash_state(self) -> StateHash:
+        '''
+        Starts maintaining the state hash (once): lets every unit and cell update it on changes
+        and computes its initial value. Games which are only played do not pay for the hashing
+        '''
+        if self.state_hash is None:
+            self.state_hash = StateHash()
+            for unit in self.all_units:
+                unit.state_hash = self.state_hash
+            for cell in self.field.cells.values() if self.is_sparse() else self.cells:
+                cell.state_hash = self.state_hash
+            self.state_hash.value = compute_state_hash(self)
+        return self.state_hash
+
+    def track_changes(self) -> ChangeLog:
+        '''
+        Starts recording which cells and units the following commands change;
+        the changes are reported by the hooks of the state hash, so the state gets hashed too
+        '''
+        self.changes = self.hash_state().changes = ChangeLog()
+        return self.changes
+
+    def start_profiling(self, profiler: Profiler = None) -> Profiler:
+        '''
+        Makes execute_on_group report every command to a profiler (a new one with a MemorySink by default)
+        '''
+        self.profiler = Profiler() if profiler is None else profiler
+        return self.profiler
+
+    def stop_profiling(self):
+        '''
+        Detaches the profiler and returns its report, which is also sent to its sink
+        '''
+        profiler, self.profiler = self.profiler, None
+        return None if profiler is None else profiler.flush()
+
+    def snapshot(self) -> CompactBoard:
+        '''
+        Returns the current state (the units and cells, submitted letters and number of commands)
+        as a CompactBoard, which restore can bring back. Boards of the same level
+        compare and hash by their state
+        '''
+        if self.layout is None:
+            self.layout = BoardLayout(self.all_units, self.board_size, self.is_sparse())
+        return CompactBoard.from_game(self, self.layout)
+
+    def restore(self, board: CompactBoard):
+        '''
+        Puts the game back into the state of one of its (or its clones') snapshots.
+        The command history is left as it is and tracked changes are not reported
+        '''
+        board.restore(self, self.layout)
+        self.number_of_commands = board.number_of_commands
+        self.goals.restart(self.submitted, sum(not typo.eliminated for typo in self.typos))
+        if self.state_hash is not None:
+            self.state_hash.value = compute_state_hash(self)
+
+    def clone(self) -> 'Game':
+        '''
+        Returns an independent copy of the game. Level data which never changes during a game
+        (words, letters, note, name, groups, neighbour table, command handler) is shared;
+        units and cells are copied with a shallow copy of their attributes and their
+        references to each other (holds, stacks, portal couples, submitted letters, goals) are remapped.
+        The copy does not track changes; it hashes its state if the original does
+        '''
+        game = Game.__new__(type(self))
+        game.__dict__.update(self.__dict__)
+        if self.state_hash is not None:
+            game.state_hash = StateHash(self.state_hash.value)
+        game.changes = None
+        game.submitted = list(self.submitted)
+        game.goals = self.goals.copy()
+        game.command_history = list(self.command_history)
+
+        # units are remapped by their index in all_units
+        copies = []
+        for unit in self.all_units:
+            unit_copy = object.__new__(type(unit))
+            unit_copy.__dict__ = dict(unit.__dict__)
+            copies.append(unit_copy)
+        for unit_copy in copies:
+            attributes = unit_copy.__dict__
+            attributes['state_hash'] = game.state_hash
+            if attributes.get('holds') is not None:
+                attributes['holds'] = copies[attributes['holds'].index]
+            if 'stack' in attributes:
+                attributes['stack'] = [copies[unit.index] for unit in attributes['stack']]
+            if attributes.get('COUPLE') is not None:
+                attributes['COUPLE'] = copies[attributes['COUPLE'].index]
+            if 'submitted' in attributes:
+                attributes['submitted'] = game.submitted
+            if 'goals' in attributes:
+                attributes['goals'] = game.goals
+        game.all_units = copies
+        game.objects = copies[:len(self.objects)]
+        game.typos = [copies[typo.index] for typo in self.typos]
+
+        game.pending_cells = set()
+        # the attributes every copied cell gets instead of the original's
+        cell_attributes = {'state_hash': game.state_hash, 'pending_cells': game.pending_cells}
+
+        def copy_cell(cell):
+            cell_copy = object.__new__(Cell)
+            attributes = cell_copy.__dict__ = {**cell.__dict__, **cell_attributes}
+            if attributes['contents'] is not None:
+                attributes['contents'] = copies[attributes['contents'].index]
+            if attributes['pending'] is not None:
+                attributes['pending'] = copies[attributes['pending'].index]
+            return cell_copy
+
+        if self.is_sparse():
+            game.field = SparseField(self.board_size, game.new_cell)
+            game.field.cells = {index: copy_cell(cell)
+                                for index, cell in self.field.cells.items()}
+            cells = game.field.cells
+        else:
+            game.cells = cells = [copy_cell(cell) for cell in self.cells]
+            columns = self.board_size[1]
+            game.field = [game.cells[i*columns:(i + 1)*columns]
+                          for i in range(self.board_size[0])]
+        game.pending_cells.update(cells[cell_index(cell.pos, self.board_size)]
+                                  for cell in self.pending_cells)
+        return game
+
+    def get_state_hash(self) -> int:
+        '''
+        Zobrist hash of the current state, maintained incrementally (see zobrist.StateHash)
+        from the first call on
+        '''
+        return self.hash_state().value
 
     def load_objects_from_txt(self, instruction_file):
-        patterns = {
-            'unit': re.compile(r'^(\d \d) (\w+)( .+)?'),
-            'groups': re.compile(r'^groups?: ?\{([\[\] ,\d]+)\}'),
-            'words': re.compile(r'^words?: ?\{([A-Z .]+)\}'),
-            'letters': re.compile(r'^letters?: ?\{([A-Z.]+)\}'),
-            'note': re.compile(r'^# ?(.*)'),
-            'name': re.compile(r'^@ ?(.*)')
-        }
-        pattern_integer_value = re.compile(r'(\w+)=(\w+)')
-        pattern_str_value = re.compile(r"(\w+)='(\w+)'")
+        self.load_objects_from_spec(load_level_spec(instruction_file))
+
+    def load_objects_from_spec(self, spec):
         unit_classes = {
             'Manipulator': Manipulator,
             'ConveyorBelt': ConveyorBelt,
@@ -167,79 +416,36 @@ class Game:
             'Typo': Typo
         }
         group_id = 0
-        unit_id = 0
-        with open(instruction_file) as f:
-            lines = f.readlines()
         # TODO: make portals set COUPLE_IDs automatically
-        is_there_a_submitter = False
-        are_words_specified = False
-        for line in lines:
-            for name, pattern in patterns.items():
-                if pattern.match(line):
-                    search_groups = pattern.search(line).groups()
-                    if name == 'unit':
-                        position_str, unit_name, kwargs_str = search_groups
-                        pos = tuple(map(int, position_str.split()))
-                        kwargs = dict()
-                        if kwargs_str is not None:
-                            kwargs_list = kwargs_str.strip().split()
-                            for kw in kwargs_list:
-                                if pattern_integer_value.match(kw):
-                                    key_, val_ = pattern_integer_value.search(
-                                        kw).groups()
-                                    kwargs[key_] = int(val_)
-                                elif pattern_str_value.match(kw):
-                                    key_, val_ = pattern_str_value.search(
-                                        kw).groups()
-                                    kwargs[key_] = val_
-                        # creating units
-                        if unit_name == 'InitStack':
-                            self.objects.append(
-                                InitStack(id=unit_id, pos=pos, letters=self.LETTERS))
-                        elif unit_name == 'Submitter':
-                            self.objects.append(
-                                Submitter(id=unit_id, pos=pos, submitted=self.submitted))
-                            is_there_a_submitter = True
-                        else:
-                            self.objects.append(
-                                unit_classes[unit_name](
-                                    id=unit_id, pos=pos, **kwargs)
-                            )
-                        unit_id += 1
-                    elif name == 'groups':
-                        groups = search_groups[0].split(',')
-                        for group in groups:
-                            this_group_object_indices = list(
-                                map(int, group.split()))
-                            types_set = {
-                                self.objects[i].TYPE for i in this_group_object_indices}
-                            if len(types_set) == 1:
-                                self.groups.append(
-                                    Group(group_id, units_type=list(types_set)[
-                                          0], units=this_group_object_indices)
-                                )
-                                for this_group_obj_index in this_group_object_indices:
-                                    self.objects[this_group_obj_index].IN_GROUP = group_id
-                            else:
-                                raise GroupOfDifferentTypes(
-                                    'There are groups containing units of different types')
-                            group_id += 1
-                    elif name == 'words':
-                        self.WORDS = search_groups[0].split()
-                        are_words_specified = True
-                    elif name == 'letters':
-                        self.LETTERS = search_groups[0]
-                    elif name == 'note':
-                        self.NOTE.append(search_groups[0])
-                    elif name == 'name':
-                        self.NAME = search_groups[0]
-                    else:
-                        raise UnmatchedCreationPattern(
-                            'unmatched_creation_pattern??')
-        if not is_there_a_submitter:
-            raise SubmitterNotFound('There must be at least one submitter')
-        if not are_words_specified:
-            raise WordsNotSpecified('To create a level give a list of words')
+        # the parser has checked that there are words, a Submitter and no unit outside of the field
+        self.board_size = spec.board_size
+        self.NOTE = list(spec.note)
+        self.NAME = spec.name
+        if spec.letters is not None:
+            self.LETTERS = spec.letters
+        self.WORDS = list(spec.words)
+        for unit_id, (unit_name, pos, kwargs) in enumerate(spec.units):
+            # creating units
+            if unit_name == 'InitStack':
+                self.objects.append(
+                    InitStack(id=unit_id, pos=pos, letters=self.LETTERS))
+            elif unit_name == 'Submitter':
+                self.objects.append(
+                    Submitter(id=unit_id, pos=pos, submitted=self.submitted))
+            else:
+                self.objects.append(
+                    unit_classes[unit_name](
+                        id=unit_id, pos=pos, **kwargs)
+                )
+        # the parser has checked that every group holds units of a single type
+        for this_group_object_indices in spec.groups:
+            self.groups.append(
+                Group(group_id, units_type=self.objects[this_group_object_indices[0]].TYPE,
+                      units=list(this_group_object_indices))
+            )
+            for this_group_obj_index in this_group_object_indices:
+                self.objects[this_group_obj_index].IN_GROUP = group_id
+            group_id += 1
         # coupled objects:
         for obj in self.objects:
             if isinstance(obj, Coupled):
@@ -256,6 +462,16 @@ class Game:
         for obj in self.objects:
             if isinstance(obj, Typo):
                 self.typos.append(obj)
+        self.goals = Goals(self.WORDS, len(self.typos))
+        for obj in self.objects:
+            if isinstance(obj, (Submitter, Typo)):
+                obj.goals = self.goals
+        # every unit the game will ever have: the Cards of InitStacks are not in self.objects
+        self.all_units = self.objects + \
+            [card for obj in self.objects if isinstance(obj, InitStack) for card in obj.stack]
+        # units are referred to by their place here, see CompactBoard
+        for index, unit in enumerate(self.all_units):
+            unit.index = index
 
     def fill_field(self):
         for obj in self.objects:
@@ -263,73 +479,127 @@ class Game:
             self.field[pos[0]][pos[1]].contents = obj
 
     def execute(self, obj: Unit, command):
+        status = self.execute_status(obj, command)
+        if status:
+            raise self.status_error(status)
+
+    def execute_status(self, obj: Unit, command) -> int:
+        '''
+        Like execute but returns the status instead of raising, see status_codes.py
+        '''
         if obj.pos is None:
-            raise ControllableIsInsideContainer
+            return CONTROLLABLE_INSIDE_CONTAINER
         if obj.is_active:
             self.number_of_commands += 1
+            status = OK
             if obj.TYPE == 'manipulator':
                 if command == 't':
-                    obj.c_take(game=self)
-                    play_sfx('manipulator_p')
+                    status = obj.c_take(game=self)
+                    sound = 'manipulator_p'
                 elif command == 'p':
-                    obj.c_put(game=self)
-                    play_sfx('manipulator_p')
+                    status = obj.c_put(game=self)
+                    sound = 'manipulator_p'
                 elif command == 'c':
                     obj.c_rotate_clockwise()
-                    play_sfx('manipulator_c')
+                    sound = 'manipulator_c'
                 elif command == 'a':
                     obj.c_rotate_counter_clockwise()
-                    play_sfx('manipulator_a')
+                    sound = 'manipulator_a'
                 elif command == 's':
                     obj.c_rotate_clockwise()
                     obj.c_rotate_clockwise()
-                    play_sfx('manipulator_a')
+                    sound = 'manipulator_a'
                 else:
-                    raise UnknownCommand(
-                        f'Unknown command for {obj.TYPE}: {command}')
+                    return self.fail(UNKNOWN_COMMAND, obj.TYPE, command)
             elif obj.TYPE == 'piston':
                 if command == 'x':
-                    obj.c_extend(game=self)
-                    play_sfx('piston')
+                    status = obj.c_extend(game=self)
+                    sound = 'piston'
                 else:
-                    raise UnknownCommand(
-                        f'Unknown command for {obj.TYPE}: {command}')
+                    return self.fail(UNKNOWN_COMMAND, obj.TYPE, command)
             elif obj.TYPE == 'conveyorbelt':
                 if command == '+':
-                    obj.c_shift_positive(game=self)
-                    play_sfx('conveyor')
+                    status = obj.c_shift_positive(game=self)
+                    sound = 'conveyor'
                 elif command == '-':
-                    obj.c_shift_negative(game=self)
-                    play_sfx('conveyor')
+                    status = obj.c_shift_negative(game=self)
+                    sound = 'conveyor'
                 else:
-                    raise UnknownCommand(
-                        f'Unknown command for {obj.TYPE}: {command}')
+                    return self.fail(UNKNOWN_COMMAND, obj.TYPE, command)
             elif obj.TYPE == 'flipper':
                 if command == 'f':
-                    obj.c_flip_unit(game=self)
-                    play_sfx('flipper')
+                    status = obj.c_flip_unit(game=self)
+                    sound = 'flipper'
                 else:
-                    raise UnknownCommand(
-                        f'Unknown command for {obj.TYPE}: {command}')
-            elif obj.TYPE == 'swapper':
-                pass
+                    return self.fail(UNKNOWN_COMMAND, obj.TYPE, command)
+            else:
+                # swappers and the like have no commands yet
+                return OK
+            if status == OK:
+                emit_sound(sound)
+            return status
+        return OK
 
     # single_command_raw):
     def execute_on_group(self, single_command: Tuple[int, str]):
+        status = self.execute_on_group_status(single_command)
+        if status:
+            raise self.status_error(status)
+
+    def execute_on_group_status(self, single_command: Tuple[int, str]) -> int:
+        '''
+        Like execute_on_group but returns the status instead of raising; the first unit
+        which fails stops the group and the pending units are not pushed then
+        '''
         # group_id, command = int(single_command_raw[0]), single_command_raw[1]
         group_id, command = single_command
+        profiler = self.profiler
         # TODO: special cases
         try:
-            for obj_id in self.groups[group_id].units:
-                self.execute(self.objects[obj_id], command)
+            units = self.groups[group_id].units
         except IndexError:
-            raise NonExistingGroup(f'There is no group with id={group_id}')
-        self.push_all()
+            if profiler is not None:
+                profiler.count_failure(NON_EXISTING_GROUP)
+            return self.fail(NON_EXISTING_GROUP, group_id)
+        for obj_id in units:
+            if profiler is None:
+                status = self.execute_status(self.objects[obj_id], command)
+            else:
+                status = profiler.execute(self, self.objects[obj_id], command)
+            if status:
+                return status
+        if profiler is None:
+            return self.push_all_status()
+        return profiler.push_all(self)
 
     def push_all(self):
-        for i in range(BOARD_SIZE[0]):
-            for j in range(BOARD_SIZE[1]):
-                self.field[i][j].push()
+        status = self.push_all_status()
+        if status:
+            raise self.status_error(status)
+
+    def push_all_status(self) -> int:
+        # only cells that received a unit need resolving; they are resolved in the
+        # same row-major order as a sweep of the whole field would visit them.
+        # A cell whose push fails keeps its pending unit and stays in the set
+        for cell in sorted(self.pending_cells, key=lambda cell: cell.pos):
+            status = cell.push()
+            if status:
+                return status
+            self.pending_cells.discard(cell)
+        return OK
+
+    def fail(self, status, *details) -> int:
+        '''
+        Records what the message of a failure needs (unformatted) and returns the status
+        '''
+        self.failure_details = details
+        return status
+
+    def status_message(self, status) -> str:
+        return status_message(status, self.failure_details)
+
+    def status_error(self, status) -> CustomException:
+        return status_error(status, self.failure_details)
 
 
 class Group:
@@ -362,43 +632,36 @@ class Manipulator(Unit):
         return f'M[{self.holds}]' if self.holds is not None else 'M'
 
     def c_rotate_clockwise(self):
-        self.direction += 1
-        self.direction %= 4
+        self.set_state('direction', (self.direction + 1) % 4)
 
     def c_rotate_counter_clockwise(self):
-        self.direction -= 1
-        self.direction %= 4
+        self.set_state('direction', (self.direction - 1) % 4)
 
     def c_take(self, game: Game):
         if self.holds is not None:
-            raise HandNotEmpty('Cannot take: manipulator\'s hand is not empty')
-
-        delta = DIRECTIONS[self.direction]
-        position = (self.pos[0] + delta[0],
-                    self.pos[1] + delta[1])
-        if inside_borders(position):
-            try:
-                self.holds = game.field[position[0]][position[1]].take()
-            except EmptyCell:
-                raise TakingFromEmptyCell(
-                    'Manipulator cannot take from an empty cell')
-        else:
-            raise TakingFromOusideOfField('Taking from outside of the borders')
+            return HAND_NOT_EMPTY
+
+        cell = game.neighbour_cell(self.pos, self.direction)
+        if cell is not None:
+            status, unit = cell.take()
+            if status == EMPTY_CELL:
+                return TAKING_FROM_EMPTY_CELL
+            if status:
+                return game.fail(status, cell.contents.TYPE)
+            self.set_state('holds', unit)
+            return OK
+        return TAKING_FROM_OUTSIDE_OF_FIELD
 
     def c_put(self, game: Game):
         if self.holds is None:
-            raise EmptyHand(
-                'There is nothing to put: manipulator\'s hand is empty')
-
-        delta = DIRECTIONS[self.direction]
-        position = (self.pos[0] + delta[0],
-                    self.pos[1] + delta[1])
-        if inside_borders(position):
-            game.field[position[0]][position[1]].put(self.holds)
-            self.holds = None
-        else:
-            raise PutOutsideOfField(
-                'Trying to put outside of the field borders')
+            return EMPTY_HAND
+
+        cell = game.neighbour_cell(self.pos, self.direction, create=True)
+        if cell is not None:
+            cell.put(self.holds)
+            self.set_state('holds', None)
+            return OK
+        return PUT_OUTSIDE_OF_FIELD
 
 
 class ConveyorBelt(Container):
@@ -411,44 +674,27 @@ class ConveyorBelt(Container):
         return f'C[{self.holds}]' if self.holds is not None else 'C'
 
     def c_shift_positive(self, game: Game):
-        if self.orientation == 'h':
-            delta = DIRECTIONS[1]  # right
-        else:
-            delta = DIRECTIONS[2]
-
-        position = (self.pos[0] + delta[0],
-                    self.pos[1] + delta[1])
-
+        direction = 1 if self.orientation == 'h' else 2  # right or down
         if not self.is_empty():
-            if inside_borders(position):
-                game.field[position[0]][position[1]].put(self.holds)
-                self.holds = None
-            else:
-                raise PutOutsideOfField(
-                    'Trying to put outside of the field borders')
+            cell = game.neighbour_cell(self.pos, direction, create=True)
+            if cell is None:
+                return PUT_OUTSIDE_OF_FIELD
+            cell.put(self.holds)
+            self.set_state('holds', None)
+        return OK
 
     def c_shift_negative(self, game: Game):
-        if self.orientation == 'h':
-            delta = DIRECTIONS[3]  # right
-        else:
-            delta = DIRECTIONS[0]
-
-        position = (self.pos[0] + delta[0],
-                    self.pos[1] + delta[1])
-
+        direction = 3 if self.orientation == 'h' else 0  # left or up
         if not self.is_empty():
-            if inside_borders(position):
-                game.field[position[0]][position[1]].put(self.holds)
-                self.holds = None
-            else:
-                raise PutOutsideOfField(
-                    'Trying to put outside of the field borders')
+            cell = game.neighbour_cell(self.pos, direction, create=True)
+            if cell is None:
+                return PUT_OUTSIDE_OF_FIELD
+            cell.put(self.holds)
+            self.set_state('holds', None)
+        return OK
 
     def flip(self):
-        if self.orientation == 'h':
-            self.orientation = 'v'
-        else:
-            self.orientation = 'h'
+        self.set_state('orientation', 'v' if self.orientation == 'h' else 'h')
 
 
 class Piston(Unit):
@@ -458,31 +704,24 @@ class Piston(Unit):
         self.direction = direction
 
     def c_extend(self, game):
-        delta = DIRECTIONS[self.direction]
-        position_to_push = (self.pos[0] + delta[0],
-                            self.pos[1] + delta[1])
-        position_to_push_to = (self.pos[0] + 2*delta[0],
-                               self.pos[1] + 2*delta[1])
-        if inside_borders(position_to_push):
-            if game.field[position_to_push[0]][position_to_push[1]].contents is not None:
-                if game.field[position_to_push[0]][position_to_push[1]].contents.IS_MOVABLE:
-                    if inside_borders(position_to_push_to):
-                        game.field[position_to_push_to[0]][position_to_push_to[1]].put(
-                            game.field[position_to_push[0]][position_to_push[1]].contents)
-                        game.field[position_to_push[0]
-                                   ][position_to_push[1]].contents = None
+        cell_to_push = game.neighbour_cell(self.pos, self.direction)
+        if cell_to_push is not None:
+            if cell_to_push.contents is not None:
+                if cell_to_push.contents.IS_MOVABLE:
+                    cell_to_push_to = game.neighbour_cell(
+                        cell_to_push.pos, self.direction, create=True)
+                    if cell_to_push_to is not None:
+                        cell_to_push_to.put(cell_to_push.contents)
+                        cell_to_push.set_contents(None)
                     else:
-                        raise PushingOutsideOfField(
-                            'Pushing outside of the field is not allowed')
+                        return PUSHING_OUTSIDE_OF_FIELD
                 else:
-                    raise ImmovableUnit(
-                        f'Unit {game.field[position_to_push[0]][position_to_push[1]].contents.TYPE} cannot be moved (pushed)')
-        else:
-            raise PushingFieldBorders('Nice try pushing the borders')
+                    return game.fail(PUSHING_IMMOVABLE_UNIT, cell_to_push.contents.TYPE)
+            return OK
+        return PUSHING_FIELD_BORDERS
 
     def flip(self):
-        self.direction += 1
-        self.direction %= 4
+        self.set_state('direction', (self.direction + 1) % 4)
 
     def __str__(self):
         return 'P'
@@ -496,27 +735,27 @@ class Portal(Coupled):
 
     def put_object(self, obj: Unit):
         if self.active:
-            self.send(obj)
-        else:
-            super().put_object(obj)
+            return self.send(obj)
+        return super().put_object(obj)
 
     def deactivate_couple(self):
-        self.COUPLE.active = False
+        self.COUPLE.set_state('active', False)
 
     def send(self, obj):
         if self.COUPLE.pos == None:
-            raise CoupledPortalInsideContainer
+            return COUPLED_PORTAL_INSIDE_CONTAINER
         if not self.COUPLE.is_empty():
-            raise OccupiedPortal('That portal is occupied')
+            return OCCUPIED_PORTAL
         obj.pos = None
-        self.COUPLE.holds = obj
-        self.holds = None
-        play_sfx('portal_send')
+        self.COUPLE.set_state('holds', obj)
+        self.set_state('holds', None)
+        emit_sound('portal_send')
+        return OK
 
     def flip(self):
-        self.active = not self.active
+        self.set_state('active', not self.active)
         if not self.active:
-            play_sfx('portal_off')
+            emit_sound('portal_off')
 
     def __str__(self):
         return f'{self.id}{self.COUPLE_ID}[{self.holds if self.holds is not None else ""}]'
@@ -534,19 +773,27 @@ class Stack(Container):
 
     def get_object(self):
         if not self.is_empty():
-            return self.stack.pop()
-        return self
+            if self.state_hash is not None:
+                self.state_hash.toggle_stack(
+                    self, len(self.stack) - 1, self.stack[-1])
+            return OK, self.stack.pop()
+        return OK, self
 
     def put_object(self, obj):
         if obj.IS_STACKABLE:
             if len(self.stack) < self.MAX_OBJECTS:
+                if self.state_hash is not None:
+                    self.state_hash.toggle_stack(self, len(self.stack), obj)
                 self.stack.append(obj)
-            else:
-                raise StackOverflow
-        else:
-            raise ObjectNotStackable
+                return OK
+            return STACK_OVERFLOW
+        return OBJECT_NOT_STACKABLE
 
     def flip(self):
+        if self.state_hash is not None:
+            for index, (old, new) in enumerate(zip(self.stack, reversed(self.stack))):
+                self.state_hash.toggle_stack(self, index, old)
+                self.state_hash.toggle_stack(self, index, new)
         self.stack = self.stack[::-1]
 
     def __str__(self):
@@ -562,10 +809,10 @@ class InitStack(Stack):
                          IS_STACKABLE, IS_CONTROLLABLE, IS_COUPLED, IS_CONTAINER)
 
     def put_object(self, obj):
-        raise InitStackPutObject
+        return INIT_STACK_PUT_OBJECT
 
     def flip(self):
-        raise InitStackFlip
+        return INIT_STACK_FLIP
 
     def __str__(self):
         s = ''.join(map(lambda x: x.letter, self.stack))
@@ -573,23 +820,29 @@ class InitStack(Stack):
 
 
 class Submitter(Container):
+    goals: Goals = None
+
     def __init__(self, id, pos, submitted, TYPE='submitter', holds=None, IN_GROUP=None, IS_MOVABLE=False, IS_STACKABLE=False, IS_CONTROLLABLE=False, IS_COUPLED=False, IS_CONTAINER=True):
         super().__init__(id, pos, TYPE, holds, IN_GROUP, IS_MOVABLE,
                          IS_STACKABLE, IS_CONTROLLABLE, IS_COUPLED, IS_CONTAINER)
         self.submitted = submitted
 
     def put_object(self, obj: Unit):
-        self.submit(obj)
+        return self.submit(obj)
 
     def get_object(self):
-        raise SubmitterTakeObject
+        return SUBMITTER_TAKE_OBJECT, None
 
     def submit(self, obj: Unit):
         if obj.TYPE == 'card':
+            if self.state_hash is not None:
+                self.state_hash.toggle_submitted(
+                    len(self.submitted), obj.letter, self)
             self.submitted.append(obj.letter)
-        else:
-            raise NotCardSubmitted(
-                'Only Card units can be submitted to the Submitter')
+            if self.goals is not None:
+                self.goals.submit(obj.letter)
+            return OK
+        return NOT_CARD_SUBMITTED
 
     def is_empty(self):
         return not bool(self.submitted)
@@ -606,25 +859,19 @@ class Flipper(Unit):
         self.direction = direction
 
     def c_flip_unit(self, game):
-        delta = DIRECTIONS[self.direction]
-        position = (self.pos[0] + delta[0],
-                    self.pos[1] + delta[1])
-        if inside_borders(position):
-            if game.field[position[0]][position[1]].contents is not None:
-                try:
-                    game.field[position[0]][position[1]].contents.flip()
-                except AttributeError:
-                    raise ObjectUnflippable(
-                        f'Object {game.field[position[0]][position[1]].contents.TYPE} is unflippable')
-            else:
-                raise NothingToFlip('There is nothing there to flip')
-        else:
-            raise FlippingOusideOfField(
-                'Trying to flip an object outside of the field')
+        cell = game.neighbour_cell(self.pos, self.direction)
+        if cell is not None:
+            if cell.contents is not None:
+                flip = getattr(cell.contents, 'flip', None)
+                if flip is None:
+                    return game.fail(OBJECT_UNFLIPPABLE, cell.contents.TYPE)
+                # only the flips which can fail return a status
+                return flip() or OK
+            return NOTHING_TO_FLIP
+        return FLIPPING_OUTSIDE_OF_FIELD
 
     def flip(self):
-        self.direction += 1
-        self.direction %= 4
+        self.set_state('direction', (self.direction + 1) % 4)
 
     def __str__(self):
         return 'F'
@@ -649,14 +896,18 @@ class Anvil(Unit):
 
 
 class Typo(Unit):
+    goals: Goals = None
+
     def __init__(self, id, pos, TYPE='typo', IN_GROUP=None, IS_MOVABLE=True, IS_STACKABLE=True, IS_CONTROLLABLE=False, IS_COUPLED=False, IS_CONTAINER=False):
         super().__init__(id, pos, TYPE, IN_GROUP, IS_MOVABLE,
                          IS_STACKABLE, IS_CONTROLLABLE, IS_COUPLED, IS_CONTAINER)
         self.eliminated = False
 
     def eliminate(self):
-        self.eliminated = True
-        play_sfx('one_typo_eliminated')
+        if not self.eliminated and self.goals is not None:
+            self.goals.typo_eliminated()
+        self.set_state('eliminated', True)
+        emit_sound('one_typo_eliminated')
 
     def flip(self):
         self.eliminate()
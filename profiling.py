@@ -0,0 +1,107 @@
+import json
+from collections import Counter, defaultdict
+from time import perf_counter
+
+from status_codes import status_name
+from utils import write_file_atomically
+
+
+class MemorySink:
+    '''
+    Keeps the reports in memory
+    '''
+
+    def __init__(self):
+        self.reports = []
+
+    def write(self, report):
+        self.reports.append(report)
+
+
+class JsonSink:
+    '''
+    Writes every report to a JSON file, replacing the previous one atomically
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, report):
+        write_file_atomically(self.path, json.dumps(report, indent=2))
+
+
+class Profiler:
+    '''
+    Counts and times the commands a game executes, see Game.start_profiling:
+        commands -- per unit type and command letter, e.g. ('manipulator', 't')
+        push_all -- the resolution of pending cells after every group command
+        exceptions -- per exception class of the commands and push_all calls which failed
+                      and of the group commands to a non-existing group
+    Clones of a profiled game report to the same profiler
+    '''
+
+    def __init__(self, sink=None):
+        self.sink = MemorySink() if sink is None else sink
+        self.reset()
+
+    def reset(self):
+        self.counts = Counter()
+        self.seconds = defaultdict(float)
+        self.exceptions = Counter()
+
+    def measure(self, key, function, *args):
+        start = perf_counter()
+        status = function(*args)
+        self.seconds[key] += perf_counter() - start
+        self.counts[key] += 1
+        if status:
+            self.count_failure(status)
+        return status
+
+    def count_failure(self, status):
+        '''
+        Counts a failure which happened before any command or push_all was run
+        '''
+        self.exceptions[status_name(status)] += 1
+
+    def execute(self, game, obj, command):
+        return self.measure((obj.TYPE, command), game.execute_status, obj, command)
+
+    def push_all(self, game):
+        return self.measure('push_all', game.push_all_status)
+
+    def report(self) -> dict:
+        def entry(key):
+            return {'count': self.counts[key], 'seconds': round(self.seconds[key], 6),
+                    'mean_us': round(self.seconds[key]/self.counts[key]*1e6, 2)}
+
+        commands = sorted((key for key in self.counts if key != 'push_all'),
+                          key=lambda key: self.seconds[key], reverse=True)
+        return {
+            'commands': {f'{unit_type} {command}': entry((unit_type, command))
+                         for unit_type, command in commands},
+            'push_all': entry('push_all') if self.counts['push_all'] else None,
+            'exceptions': dict(self.exceptions.most_common()),
+        }
+
+    def flush(self):
+        '''
+        Sends the report to the sink and starts over
+        '''
+        report = self.report()
+        self.sink.write(report)
+        self.reset()
+        return report
+
+
+def format_report(report) -> str:
+    lines = [f'{"command":<32}{"count":>9}{"seconds":>12}{"mean us":>10}']
+    entries = list(report['commands'].items())
+    if report['push_all'] is not None:
+        entries.append(('push_all', report['push_all']))
+    for name, entry in entries:
+        lines.append(
+            f'{name:<32}{entry["count"]:>9}{entry["seconds"]:>12.6f}{entry["mean_us"]:>10.2f}')
+    for name, count in report['exceptions'].items():
+        lines.append(f'{name:<32}{count:>9}')
+    return '\n'.join(lines)
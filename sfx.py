@@ -1,30 +1,71 @@
-from utils import MUSIC_DEFAULT_VOLUME, SFX_DEFAULT_VOLUME, SFX_DIR
+from utils import MUSIC_DEFAULT_VOLUME, SFX_CACHE_SIZE, SFX_DEFAULT_VOLUME, SFX_DIR
 from pygame import mixer
 import os
+from collections import OrderedDict
 from random import random
 from pathlib import PurePath
+from threading import Lock, Thread
 
 mixer.init()
-sfx_files = os.listdir(SFX_DIR)
+sfx_files = {file[:-4]: PurePath(SFX_DIR, file)
+             for file in os.listdir(SFX_DIR)}
+# the most frequently played first
+PREFETCH_ORDER = ['cool_click_down', 'cool_click_up', 'manipulator_p', 'manipulator_c', 'manipulator_a',
+                  'conveyor', 'warning', 'exception', 'prompt_warning', 'piston', 'flipper', 'fart']
 
-sfx = {file[:-4]: mixer.Sound(PurePath(SFX_DIR, file))
-       for file in sfx_files}
+# decoded sounds, the least recently played first
+sfx = OrderedDict()
+sfx_lock = Lock()
+sfx_volume = SFX_DEFAULT_VOLUME
 
 
-def set_sfx_volume(vol):
-    global sfx
-    for s_effect in sfx.values():
-        s_effect.set_volume(vol)
+def get_sfx(name) -> mixer.Sound:
+    '''
+    Returns the decoded sound effect; sounds are decoded on first use
+    and at most SFX_CACHE_SIZE of them are kept
+    '''
+    with sfx_lock:
+        if name in sfx:
+            sfx.move_to_end(name)
+            return sfx[name]
+    # decoding is slow, the lock is not held meanwhile
+    sound = mixer.Sound(sfx_files[name])
+    with sfx_lock:
+        if name in sfx:
+            return sfx[name]
+        sound.set_volume(sfx_volume)
+        sfx[name] = sound
+        while len(sfx) > SFX_CACHE_SIZE:
+            sfx.popitem(last=False)
+    return sound
+
 
+def prefetch_sfx(names=PREFETCH_ORDER):
+    '''
+    Decodes sound effects on a background thread so that the first play_sfx calls
+    do not stall a frame; the windows can be shown before it is done
+    '''
+    def prefetch():
+        for name in names[:SFX_CACHE_SIZE]:
+            get_sfx(name)
+    thread = Thread(target=prefetch, name='prefetch_sfx', daemon=True)
+    thread.start()
+    return thread
 
-set_sfx_volume(SFX_DEFAULT_VOLUME)
+
+def set_sfx_volume(vol):
+    global sfx_volume
+    with sfx_lock:
+        sfx_volume = vol
+        for s_effect in sfx.values():
+            s_effect.set_volume(vol)
 
 
 def play_sfx(name):
     if random() < 0.99:
-        sfx[name].play()
+        get_sfx(name).play()
     else:
-        sfx['fart'].play()
+        get_sfx('fart').play()
 
 
 def play_bg_music():
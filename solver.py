@@ -0,0 +1,664 @@
+import argparse
+import heapq
+from itertools import count, permutations, product
+from math import inf
+
+from board import cell_index
+from goals import DEAD, WON
+from objects import (Anvil, Card, Container, ConveyorBelt, Flipper, Game, InitStack, Manipulator,
+                     Piston, Portal, Stack, Submitter)
+from utils import DIRECTIONS, UNIT_COMMANDS, inside_borders
+
+
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+OUT_OF_BUDGET = 'out of budget'
+
+ROTATIONS = {'': 0, 'c': 1, 's': 2, 'a': 3}
+# the directions a conveyor belt shifts in by its orientation
+BELT_DIRECTIONS = {'h': (1, 3), 'v': (2, 0)}
+
+
+def get_actions(game: Game):
+    return [(group.id, cmd) for group in game.groups for cmd in UNIT_COMMANDS.get(group.units_type, '')]
+
+
+def get_moves(game: Game):
+    '''
+    The actions the search tries, each a tuple of (group_id, command).
+    A manipulator's direction matters only to its next take or put, so its rotations are
+    merged into them: a move is at most one rotation (c, a or s, which reach every direction
+    at the cost of a single command) followed by t or p. Two rotations in a row and rotations
+    which are never followed by a take or a put are never worth trying then
+    '''
+    moves = []
+    for group in game.groups:
+        if group.units_type == 'manipulator':
+            moves.extend(tuple((group.id, cmd) for cmd in rotation + action)
+                         for action in 'tp' for rotation in ROTATIONS)
+        else:
+            moves.extend(((group.id, cmd),) for cmd in UNIT_COMMANDS.get(group.units_type, ''))
+    return moves
+
+
+def front_contents(game: Game, unit, direction):
+    '''
+    (is the adjacent cell inside of the field, the unit in it or None)
+    '''
+    delta = DIRECTIONS[direction]
+    pos = (unit.pos[0] + delta[0], unit.pos[1] + delta[1])
+    if not inside_borders(pos, game.board_size):
+        return False, None
+    cell = game.peek_cell(pos)
+    return True, None if cell is None else cell.contents
+
+
+def may_change_state(game: Game, move):
+    '''
+    Cheap check on the parent which rules out most moves that would fail or leave the state
+    as it is, so that the search does not clone the game for them
+    '''
+    group_id = move[0][0]
+    command = move[-1][1]
+    units = [game.objects[obj_id] for obj_id in game.groups[group_id].units]
+    if any(unit.pos is None for unit in units):
+        return False
+    units = [unit for unit in units if unit.is_active]
+    if not units:
+        return False
+    if command in 'tp':
+        rotation = ROTATIONS[''.join(cmd for _, cmd in move[:-1])]
+        for unit in units:
+            if (unit.holds is None) != (command == 't'):
+                return False
+            inside, contents = front_contents(game, unit, (unit.direction + rotation) % 4)
+            if not inside or command == 't' and contents is None:
+                return False
+        return True
+    if command in '+-':
+        return any(not unit.is_empty() for unit in units)
+    if command == 'x':
+        return any(front_contents(game, unit, unit.direction)[1] is not None for unit in units)
+    if command == 'f':
+        return all(front_contents(game, unit, unit.direction)[1] is not None for unit in units)
+    return True
+
+
+def is_dead_end(game: Game):
+    '''
+    A game is lost for good once the submitted letters are not a prefix of any word
+    '''
+    return game.status() == DEAD
+
+
+def neighbour(pos, direction):
+    delta = DIRECTIONS[direction]
+    return pos[0] + delta[0], pos[1] + delta[1]
+
+
+def distance(pos, other):
+    return abs(pos[0] - other[0]) + abs(pos[1] - other[1])
+
+
+class Mobility:
+    '''
+    Which units of a level may ever move and which may ever be flipped, judged from the initial board.
+    Only a manipulator next to a unit or a piston behind it moves the unit and only a flipper in front
+    of it flips it, so a unit none of them can ever reach stays where (and as) it is for the whole game.
+    A unit which may move is assumed to get anywhere, but into the cells of the units which never move,
+    unless an anvil which may move crushes them (anything but a submitter)
+    '''
+
+    def __init__(self, game: Game):
+        self.board_size = game.board_size
+        self.units = list(game.objects)
+        self.movable = set()
+        self.flippable = set()
+        changed = True
+        while changed:
+            changed = False
+            for unit in self.units:
+                if unit.index not in self.movable and unit.IS_MOVABLE and self.is_moved(unit):
+                    self.movable.add(unit.index)
+                    changed = True
+                if unit.index not in self.flippable and self.is_flipped(unit):
+                    self.flippable.add(unit.index)
+                    changed = True
+        self.crushing = any(isinstance(unit, Anvil) and unit.index in self.movable for unit in self.units)
+
+    def directions(self, unit):
+        '''
+        The directions a piston or a flipper may ever face
+        '''
+        return range(4) if unit.index in self.flippable else (unit.direction,)
+
+    def places(self, unit):
+        '''
+        The cells a unit may ever be in (and act from)
+        '''
+        if unit.index not in self.movable:
+            return [unit.pos]
+        rows, cols = self.board_size
+        fixed = {other.pos for other in self.units if other.index not in self.movable
+                 and (not self.crushing or isinstance(other, Submitter))}
+        return [(row, col) for row in range(rows) for col in range(cols) if (row, col) not in fixed]
+
+    def is_moved(self, unit):
+        for other in self.units:
+            if other is unit:
+                continue
+            if isinstance(other, Manipulator):
+                if other.index in self.movable or distance(other.pos, unit.pos) == 1:
+                    return True
+            elif isinstance(other, Piston):
+                if other.index in self.movable:
+                    return True
+                for direction in self.directions(other):
+                    if neighbour(other.pos, direction) == unit.pos and \
+                            inside_borders(neighbour(unit.pos, direction), self.board_size):
+                        return True
+        return False
+
+    def is_flipped(self, unit):
+        if not hasattr(unit, 'flip') or isinstance(unit, InitStack):
+            return False
+        for other in self.units:
+            if other is unit or not isinstance(other, Flipper):
+                continue
+            if other.index in self.movable or unit.index in self.movable or \
+                    any(neighbour(other.pos, direction) == unit.pos for direction in self.directions(other)):
+                return True
+        return False
+
+
+class Transport:
+    '''
+    The fewest commands which may carry a card from each place of the board to a submitter, found once
+    per level by Dijkstra from the submitters backwards over a relaxation of the game: every unit which
+    Mobility finds movable is at hand wherever the card needs it and cells are never taken by
+    anything but the units which never move.
+    A card moves by a cell with every take or put of a manipulator, push of a piston or shift of a conveyor
+    belt, and a manipulator which holds it is moved like any other unit. Turning the manipulator between
+    its take and its put is a command of its own. Put into a portal which may be active the card goes
+    on to wherever the portal's couple may be.
+    The places of a card are the nodes: it lies in a cell (in a container there, too) or a manipulator
+    in a cell holds it facing some direction. A manipulator put into a container cannot put the card
+    anywhere until some unit takes it out, so it is only carried on from there.
+    unit_costs counts a command on a group once for each of its units and every command once, group_costs
+    the commands which move the card (or turn the manipulator holding it), each with the size of its group
+    '''
+
+    def __init__(self, game: Game, mobility: Mobility):
+        self.board_size = rows, cols = game.board_size
+        cells = [(row, col) for row in range(rows) for col in range(cols)]
+        self.number_of_cells = number_of_cells = len(cells)
+        fixed = {unit.pos: unit for unit in game.objects if unit.index not in mobility.movable}
+        crushing = mobility.crushing
+        # an anvil crushes units, even those which never move, and inactive units count no commands
+        blocked = set() if crushing else {pos for pos, unit in fixed.items()
+                                          if not isinstance(unit, Container) or isinstance(unit, InitStack)}
+        weights = {group.id: 1 if crushing else len(group.units) for group in game.groups}
+
+        # {cell: weight} of the manipulators, {(cell, direction): weight} of pistons pushing
+        # and conveyor belts shifting in the direction
+        manipulators, pistons, belts = {}, {}, {}
+        for unit in game.objects:
+            if isinstance(unit, Manipulator):
+                options = [(pos, manipulators) for pos in mobility.places(unit)]
+            elif isinstance(unit, Piston):
+                options = [((pos, direction), pistons) for pos in mobility.places(unit)
+                           for direction in mobility.directions(unit)]
+            elif isinstance(unit, ConveyorBelt):
+                orientations = 'hv' if unit.index in mobility.flippable else unit.orientation
+                options = [((pos, direction), belts) for pos in mobility.places(unit)
+                           for orientation in orientations for direction in BELT_DIRECTIONS[orientation]]
+            else:
+                continue
+            weight = weights[unit.IN_GROUP]
+            for key, table in options:
+                table[key] = min(table.get(key, inf), weight)
+        # any unit which moves units may move a manipulator holding a card
+        carriers = any(isinstance(unit, Manipulator) and unit.index in mobility.movable
+                       for unit in game.objects)
+        carrier_weight = min(weights[unit.IN_GROUP] for unit in game.objects
+                             if isinstance(unit, (Manipulator, Piston, ConveyorBelt)))\
+            if carriers else inf
+        portals = [unit for unit in game.objects if isinstance(unit, Portal)]
+        # the couples of the portals which may be put anywhere, the cells where portals may be put
+        movable_couples = [portal.COUPLE for portal in portals if portal.index in mobility.movable]
+        couple_cells = {pos for portal in portals if portal.index in mobility.movable
+                        for pos in mobility.places(portal)}
+
+        # arriving in a cell (free or held) leads on to a node, the rest of the nodes are virtual:
+        # in a couple which may be anywhere (free or held facing some direction) and the submitters
+        arriving = 9*number_of_cells
+        arriving_held = 10*number_of_cells
+        anywhere = 14*number_of_cells
+        self.goal = goal = anywhere + 5
+
+        edges = []
+
+        def add(source, target, units=0, weight=0):
+            edges.append((source, target, units, weight))
+
+        for pos in cells:
+            index = self.free(pos)
+            for direction in range(4):
+                further = neighbour(pos, direction)
+                manipulator = neighbour(pos, (direction + 2) % 4)
+                if manipulator in manipulators:
+                    add(index, self.held(manipulator, direction), 1, manipulators[manipulator])
+                if not inside_borders(further, self.board_size):
+                    continue
+                if (manipulator, direction) in pistons:
+                    add(index, arriving + cell_index(further, self.board_size),
+                        1, pistons[manipulator, direction])
+                if (pos, direction) in belts:
+                    add(index, arriving + cell_index(further, self.board_size),
+                        1, belts[pos, direction])
+            for facing in range(4):
+                index = self.held(pos, facing)
+                for direction in range(4):
+                    further = neighbour(pos, direction)
+                    if not inside_borders(further, self.board_size):
+                        continue
+                    further_index = cell_index(further, self.board_size)
+                    if pos in manipulators:
+                        turns = 1 + (direction != facing)
+                        add(index, arriving + further_index, turns, turns*manipulators[pos])
+                    if carriers:
+                        add(index, arriving_held + 4*further_index + facing, 1, carrier_weight)
+                        add(self.stuck(pos, facing), arriving_held + 4*further_index + facing,
+                            1, carrier_weight)
+
+        for pos in cells:
+            index = cell_index(pos, self.board_size)
+            unit = fixed.get(pos)
+            if isinstance(unit, Submitter):
+                add(arriving + index, goal)
+                continue
+            if pos in blocked:
+                continue
+            if isinstance(unit, Portal):
+                stays = not unit.active or unit.index in mobility.flippable or crushing
+                couples = [unit.COUPLE] if unit.active or unit.index in mobility.flippable else []
+            else:
+                stays = True
+                couples = movable_couples
+            for facing in range(4):
+                if stays:
+                    # a manipulator put into a container stays there, otherwise it is free to put
+                    add(arriving_held + 4*index + facing, self.stuck(pos, facing)
+                        if isinstance(unit, Container) and not crushing else self.held(pos, facing))
+                for couple in couples:
+                    if couple.index in mobility.movable:
+                        add(arriving_held + 4*index + facing, anywhere + 1 + facing)
+                    else:
+                        add(arriving_held + 4*index + facing, self.stuck(couple.pos, facing))
+            if stays:
+                add(arriving + index, self.free(pos))
+            for couple in couples:
+                add(arriving + index, anywhere if couple.index in mobility.movable else self.free(couple.pos))
+        for pos in couple_cells:
+            add(anywhere, self.free(pos))
+            for facing in range(4):
+                add(anywhere + 1 + facing, self.stuck(pos, facing))
+
+        self.unit_costs = self.backwards(edges, 2)
+        self.group_costs = self.backwards(edges, 3)
+
+    def free(self, pos):
+        return cell_index(pos, self.board_size)
+
+    def held(self, pos, facing):
+        return self.number_of_cells + 4*cell_index(pos, self.board_size) + facing
+
+    def stuck(self, pos, facing):
+        return 5*self.number_of_cells + 4*cell_index(pos, self.board_size) + facing
+
+    def place(self, pos, facing):
+        '''
+        The node of a card in the cell pos, held by a manipulator facing the direction facing (or None)
+        '''
+        return self.free(pos) if facing is None else self.held(pos, facing)
+
+    def backwards(self, edges, cost_index):
+        incoming = {}
+        for edge in edges:
+            incoming.setdefault(edge[1], []).append((edge[0], edge[cost_index]))
+        costs = {self.goal: 0}
+        queue = [(0, self.goal)]
+        while queue:
+            cost, node = heapq.heappop(queue)
+            if cost > costs[node]:
+                continue
+            for source, edge_cost in incoming.get(node, ()):
+                if cost + edge_cost < costs.get(source, inf):
+                    costs[source] = cost + edge_cost
+                    heapq.heappush(queue, (cost + edge_cost, source))
+        return costs
+
+
+def meeting_cost(start, moves, targets):
+    '''
+    The fewest moves along a line (a row or a column) which bring a flipper from start next to the typos
+    one after another: targets are (where the flipper meets the typo as it is, whether the typo may move),
+    a typo which is not there moves as far as the flipper would have to. A flipper which cannot move
+    stays at start
+    '''
+    stops = [start] if not moves else sorted({start, *(target for target, _ in targets)})
+    costs = {start: 0}
+    for target, movable in targets:
+        reached = {}
+        for stop in stops:
+            if movable:
+                own = abs(stop - target)
+            elif stop == target:
+                own = 0
+            else:
+                continue
+            reached[stop] = own + min(cost + abs(stop - previous) for previous, cost in costs.items())
+        if not reached:
+            return inf
+        costs = reached
+    return min(costs.values())
+
+
+class FlipperMoves:
+    '''
+    A lower bound of the commands which move flippers and typos so that every typo left gets flipped:
+    for each typo a flipper has to stand next to it and face it, and a flipper turns only when another
+    flipper flips it (clockwise). The distances split into rows and columns, see meeting_cost.
+    Tried are all the ways the flippers may share (up to MAX_TYPOS) typos, one after another;
+    with more typos only the typo farthest from the flippers counts
+    '''
+    MAX_TYPOS = 4
+
+    def __init__(self, game: Game, mobility: Mobility):
+        self.mobility = mobility
+        self.flippers = [unit for unit in game.objects if isinstance(unit, Flipper)]
+        self.cache = {}
+
+    def __call__(self, typos, cells):
+        '''
+        typos: the Typos left, cells: {unit index: the cell it is in}
+        '''
+        movable = self.mobility.movable
+        typos = tuple((cells[typo.index], typo.index in movable) for typo in typos)
+        flippers = tuple((cells[flipper.index], flipper.direction, flipper.index in movable,
+                          flipper.index in self.mobility.flippable)
+                         for flipper in self.flippers if flipper.index in cells)
+        key = typos, flippers
+        if key not in self.cache:
+            self.cache[key] = self.cost(typos, flippers)
+        return self.cache[key]
+
+    def cost(self, typos, flippers):
+        if len(typos) > self.MAX_TYPOS:
+            return max(min((self.sequence_cost(flipper, (typo,)) for flipper in flippers), default=inf)
+                       for typo in typos)
+        best = inf
+        for shares in product(range(len(flippers)), repeat=len(typos)):
+            cost = 0
+            for number, flipper in enumerate(flippers):
+                own = [typo for typo, share in zip(typos, shares) if share == number]
+                if own:
+                    cost += min(self.sequence_cost(flipper, order) for order in permutations(own))
+            best = min(best, cost)
+        return best
+
+    def sequence_cost(self, flipper, typos):
+        pos, direction, movable, flippable = flipper
+        best = inf
+        for directions in product(range(4) if flippable else (direction,), repeat=len(typos)):
+            # the flips which turn the flipper
+            cost = sum((new - old) % 4 for old, new in zip((direction,) + directions, directions))
+            for axis in (0, 1):
+                targets = [(typo_pos[axis] - DIRECTIONS[facing][axis], typo_movable)
+                           for (typo_pos, typo_movable), facing in zip(typos, directions)]
+                cost += meeting_cost(pos[axis], movable, targets)
+            best = min(best, cost)
+        return best
+
+
+def locate(game: Game):
+    '''
+    ({unit index: the cell of the unit on the board which holds (or is) it}, [(card, cell, facing)])
+    where facing is the direction of the manipulator which holds the card (the innermost one) or None
+    '''
+    cells = {}
+    cards = []
+
+    def visit(unit, pos, facing):
+        cells[unit.index] = pos
+        if isinstance(unit, Card):
+            cards.append((unit, pos, facing))
+        holds = getattr(unit, 'holds', None)
+        if holds is not None:
+            visit(holds, pos, unit.direction if isinstance(unit, Manipulator) else facing)
+        for stacked in getattr(unit, 'stack', ()):
+            visit(stacked, pos, facing)
+
+    for _, cell in game.occupied_cells():
+        visit(cell.contents, cell.pos, None)
+    return cells, cards
+
+
+class Heuristic:
+    '''
+    Admissible A* heuristic in commands, as counted by Game.number_of_commands: a command on a group
+    counts once for every unit of it. Every such unit-command moves a single unit (with whatever it holds)
+    by a cell or through a portal, turns a single manipulator or flips a single unit, so, unless a Stack
+    carries several of them at once, the commands which move different cards, typos and flippers add up:
+    every card of the cheapest word costs its Transport.unit_costs, every typo left a flip
+    and the flippers and typos have to meet (see FlipperMoves, which counts distances, so not on levels
+    with portals). A command on a group of several units may move several cards at once, so their
+    Transport.group_costs do not add up, only the costliest card counts there.
+    Returns inf for a game which cannot be won anymore
+    '''
+
+    def __init__(self, game: Game):
+        self.words = list(game.WORDS)
+        mobility = Mobility(game)
+        self.transport = Transport(game, mobility)
+        self.add_costs = not any(isinstance(unit, Stack) and unit.index in mobility.movable
+                                 for unit in game.objects)
+        self.flipper_moves = None
+        if self.add_costs and not any(isinstance(unit, (Portal, Anvil)) for unit in game.objects):
+            self.flipper_moves = FlipperMoves(game, mobility)
+
+    def card_costs(self, cards):
+        '''
+        ({letter: sorted unit costs of the cards with it}, {letter: the least group cost of a card with it})
+        '''
+        unit_costs, group_costs = {}, {}
+        for card, pos, facing in cards:
+            place = self.transport.place(pos, facing)
+            unit_costs.setdefault(card.letter, []).append(self.transport.unit_costs.get(place, inf))
+            group_costs[card.letter] = min(group_costs.get(card.letter, inf),
+                                           self.transport.group_costs.get(place, inf))
+        for costs in unit_costs.values():
+            costs.sort()
+        return unit_costs, group_costs
+
+    def word_cost(self, letters, unit_costs):
+        if not self.add_costs:
+            # the first letter's card is still carried on its own, the others need a command each
+            first = unit_costs.get(letters[0])
+            return inf if not first else first[0] + len(letters) - 1
+        cost = 0
+        for letter in set(letters):
+            costs = unit_costs.get(letter, ())
+            needed = letters.count(letter)
+            if len(costs) < needed:
+                return inf
+            cost += sum(costs[:needed])
+        return cost
+
+    def __call__(self, game: Game):
+        goals = game.goals
+        letters_left = goals.letters_left()
+        if letters_left == inf:
+            return inf
+        cells, cards = locate(game)
+        flips = goals.typos_left
+        typo_cost = flips
+        if flips and self.flipper_moves is not None:
+            typo_cost += self.flipper_moves([typo for typo in game.typos if not typo.eliminated], cells)
+        if not letters_left:
+            return typo_cost
+        unit_costs, group_costs = self.card_costs(cards)
+        submitted = ''.join(game.submitted)
+        return min((max(self.word_cost(word[len(submitted):], unit_costs) + typo_cost,
+                        max(group_costs.get(letter, inf) for letter in word[len(submitted):]) + flips)
+                    for word in self.words if len(word) > len(submitted) and word.startswith(submitted)),
+                   default=inf)
+
+
+class Directions:
+    '''
+    Which states are no better than one reached before because of the directions of their manipulators.
+    A manipulator turns to any direction with a single command (c, a or s) and its direction matters to
+    nothing but its own takes and puts, so a state which differs from another one only in the directions
+    of k manipulators needs at most k commands more to win than it.
+    Boards are split into the directions of the manipulators and everything else for that
+    '''
+
+    def __init__(self, game: Game):
+        layout = game.layout
+        self.manipulators = [place for place, i in enumerate(layout.directed)
+                             if isinstance(game.all_units[i], Manipulator)]
+        self.others = [place for place, i in enumerate(layout.directed)
+                       if not isinstance(game.all_units[i], Manipulator)]
+        self.number_of_directed = len(layout.directed)
+        # the values which follow the directions in a CompactBoard
+        self.tail = len(layout.oriented) + layout.number_of_units + len(layout.portals) + len(layout.typos)
+        # {everything else: [(directions, number of commands), ...]}
+        self.reached = {}
+
+    def split(self, board):
+        data = board.data
+        end = len(data) - self.tail
+        directions = data[end - self.number_of_directed:end]
+        rest = (data[:end - self.number_of_directed].tobytes(), data[end:].tobytes(),
+                tuple(directions[place] for place in self.others), board.submitted)
+        return rest, tuple(directions[place] for place in self.manipulators)
+
+    def is_dominated(self, board):
+        '''
+        Whether a state at least as good as the board's has been reached; records the board otherwise
+        '''
+        rest, directions = self.split(board)
+        reached = self.reached.setdefault(rest, [])
+        for other_directions, number_of_commands in reached:
+            turns = sum(a != b for a, b in zip(directions, other_directions))
+            if number_of_commands + turns <= board.number_of_commands:
+                return True
+        reached.append((directions, board.number_of_commands))
+        return False
+
+
+def format_solution(actions):
+    '''
+    Turns a list of (group_id, cmd) into the command_history string format,
+    merging consecutive commands on the same group: [(0, 't'), (0, 'c')] -> "0tc"
+    '''
+    prompts = []
+    for group_id, cmd in actions:
+        if prompts and prompts[-1][0] == group_id:
+            prompts[-1][1].append(cmd)
+        else:
+            prompts.append((group_id, [cmd]))
+    return ' '.join(f'{group_id}{"".join(cmds)}' for group_id, cmds in prompts)
+
+
+def solution_path(parents, board):
+    '''
+    The (group_id, cmd) actions which lead from the initial board to the given one
+    '''
+    moves = []
+    while parents[board] is not None:
+        board, move = parents[board]
+        moves.append(move)
+    return [action for move in reversed(moves) for action in move]
+
+
+def solve(level_file, max_states=200_000):
+    '''
+    Finds a solution with the minimal number of commands (as counted by Game.number_of_commands)
+    with A* over the moves of get_moves.
+    A single game is played: every expanded state is restored from its CompactBoard, which is all
+    the frontier keeps, and each move is tried on it and undone by restoring the board again.
+    Pruned are moves which fail or do not change the state, repeated states (by their CompactBoard),
+    states which differ from one reached with fewer commands only in the directions of manipulators
+    (see Directions) and states where the submitted letters cannot become a word anymore.
+    Returns (SOLVED, (word, num_of_cmds, solution)) with the tuple GameWindow returns,
+    (UNSOLVABLE, None) once every reachable state is tried or
+    (OUT_OF_BUDGET, None) after max_states expanded states
+    '''
+    game = Game(level_file)
+    moves = get_moves(game)
+    heuristic = Heuristic(game)
+    tie_breaker = count()
+    start = game.snapshot()
+    directions = Directions(game)
+    directions.is_dominated(start)
+    frontier = [(heuristic(game), 0, next(tie_breaker), start)]
+    best_cost = {start: 0}
+    # the board each state was reached from and the move which did it
+    parents = {start: None}
+    expanded = 0
+    while frontier:
+        if expanded >= max_states:
+            return OUT_OF_BUDGET, None
+        _, _, _, board = heapq.heappop(frontier)
+        if best_cost[board] < board.number_of_commands:
+            continue
+        game.restore(board)
+        if game.status() == WON:
+            return SOLVED, (''.join(game.submitted), game.number_of_commands,
+                            format_solution(solution_path(parents, board)))
+        expanded += 1
+        # whether the game has left the state of the board
+        played = False
+        for move in moves:
+            if played:
+                game.restore(board)
+                played = False
+            if not may_change_state(game, move):
+                continue
+            played = True
+            if any(game.execute_on_group_status(command) for command in move):
+                continue
+            if is_dead_end(game):
+                continue
+            key = game.snapshot()
+            if key == board:
+                continue
+            if directions.is_dominated(key):
+                continue
+            estimate = heuristic(game)
+            if estimate == inf:
+                continue
+            best_cost[key] = key.number_of_commands
+            parents[key] = (board, move)
+            heapq.heappush(frontier, (key.number_of_commands + estimate, -key.number_of_commands,
+                                      next(tie_breaker), key))
+    return UNSOLVABLE, None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Find a solution with the minimal number of commands for a level')
+    parser.add_argument('level_file')
+    parser.add_argument('--max-states', type=int, default=200_000)
+    args = parser.parse_args()
+    outcome, result = solve(args.level_file, args.max_states)
+    if outcome == SOLVED:
+        word, num_of_cmds, solution = result
+        print(f'{word}: {num_of_cmds} commands')
+        print(solution)
+    elif outcome == OUT_OF_BUDGET:
+        print(f'no solution found within {args.max_states} states')
+    else:
+        print('the level has no solution')
@@ -0,0 +1,86 @@
+from exceptions import *
+
+
+# what the engine's *_status methods return; everything but OK is a failed command
+OK = 0
+NON_EXISTING_GROUP = 1
+CONTROLLABLE_INSIDE_CONTAINER = 2
+UNKNOWN_COMMAND = 3
+HAND_NOT_EMPTY = 4
+EMPTY_HAND = 5
+EMPTY_CELL = 6
+TAKING_FROM_EMPTY_CELL = 7
+TAKING_FROM_OUTSIDE_OF_FIELD = 8
+PUT_OUTSIDE_OF_FIELD = 9
+IMMOVABLE_UNIT = 10
+PUSHING_IMMOVABLE_UNIT = 11
+PUSHING_OUTSIDE_OF_FIELD = 12
+PUSHING_FIELD_BORDERS = 13
+OCCUPIED_CELL = 14
+OCCUPIED_CONTAINER = 15
+OCCUPIED_PORTAL = 16
+COUPLED_PORTAL_INSIDE_CONTAINER = 17
+STACK_OVERFLOW = 18
+OBJECT_NOT_STACKABLE = 19
+INIT_STACK_PUT_OBJECT = 20
+INIT_STACK_FLIP = 21
+SUBMITTER_TAKE_OBJECT = 22
+NOT_CARD_SUBMITTED = 23
+CRUSHING_SUBMITTER = 24
+OBJECT_UNFLIPPABLE = 25
+NOTHING_TO_FLIP = 26
+FLIPPING_OUTSIDE_OF_FIELD = 27
+
+# the exception and the message of every failure; the {} of a message are filled
+# with the details recorded by Game.fail, only once the message is asked for
+STATUS_ERRORS = {
+    NON_EXISTING_GROUP: (NonExistingGroup, 'There is no group with id={}'),
+    CONTROLLABLE_INSIDE_CONTAINER: (ControllableIsInsideContainer, None),
+    UNKNOWN_COMMAND: (UnknownCommand, 'Unknown command for {}: {}'),
+    HAND_NOT_EMPTY: (HandNotEmpty, 'Cannot take: manipulator\'s hand is not empty'),
+    EMPTY_HAND: (EmptyHand, 'There is nothing to put: manipulator\'s hand is empty'),
+    EMPTY_CELL: (EmptyCell, None),
+    TAKING_FROM_EMPTY_CELL: (TakingFromEmptyCell, 'Manipulator cannot take from an empty cell'),
+    TAKING_FROM_OUTSIDE_OF_FIELD: (TakingFromOusideOfField, 'Taking from outside of the borders'),
+    PUT_OUTSIDE_OF_FIELD: (PutOutsideOfField, 'Trying to put outside of the field borders'),
+    IMMOVABLE_UNIT: (ImmovableUnit, 'Unit {} is immovable'),
+    PUSHING_IMMOVABLE_UNIT: (ImmovableUnit, 'Unit {} cannot be moved (pushed)'),
+    PUSHING_OUTSIDE_OF_FIELD: (PushingOutsideOfField, 'Pushing outside of the field is not allowed'),
+    PUSHING_FIELD_BORDERS: (PushingFieldBorders, 'Nice try pushing the borders'),
+    OCCUPIED_CELL: (OccupiedCell, None),
+    OCCUPIED_CONTAINER: (OccupiedContainer, None),
+    OCCUPIED_PORTAL: (OccupiedPortal, 'That portal is occupied'),
+    COUPLED_PORTAL_INSIDE_CONTAINER: (CoupledPortalInsideContainer, None),
+    STACK_OVERFLOW: (StackOverflow, None),
+    OBJECT_NOT_STACKABLE: (ObjectNotStackable, None),
+    INIT_STACK_PUT_OBJECT: (InitStackPutObject, None),
+    INIT_STACK_FLIP: (InitStackFlip, None),
+    SUBMITTER_TAKE_OBJECT: (SubmitterTakeObject, None),
+    NOT_CARD_SUBMITTED: (NotCardSubmitted, 'Only Card units can be submitted to the Submitter'),
+    CRUSHING_SUBMITTER: (CrushingSubmitter, 'Nice try looser hahahahaah'),
+    OBJECT_UNFLIPPABLE: (ObjectUnflippable, 'Object {} is unflippable'),
+    NOTHING_TO_FLIP: (NothingToFlip, 'There is nothing there to flip'),
+    FLIPPING_OUTSIDE_OF_FIELD: (FlippingOusideOfField, 'Trying to flip an object outside of the field'),
+}
+
+
+def status_name(status) -> str:
+    '''
+    The name of the exception class of a failure, e.g. for counting failures by kind
+    '''
+    return STATUS_ERRORS[status][0].__name__
+
+
+def status_message(status, details=()) -> str:
+    message = STATUS_ERRORS[status][1]
+    return '' if message is None else message.format(*details)
+
+
+def status_error(status, details=()) -> CustomException:
+    '''
+    The exception the engine's exception API raises for a failure
+    '''
+    exception_class, message = STATUS_ERRORS[status]
+    if message is None:
+        return exception_class()
+    return exception_class(message.format(*details))
@@ -0,0 +1,38 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+LEVELS_DIR = REPO_DIR / 'levels'
+
+# the tests import the modules of the game, which live at the root of the repo
+if str(REPO_DIR) not in sys.path:
+    sys.path.insert(0, str(REPO_DIR))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def in_repo_dir():
+    '''
+    The game finds its assets and caches relative to the root of the repo, whichever
+    directory the tests are run from
+    '''
+    working_dir = os.getcwd()
+    os.chdir(REPO_DIR)
+    yield
+    os.chdir(working_dir)
+
+
+@pytest.fixture
+def levels_dir():
+    return LEVELS_DIR
+
+
+@pytest.fixture(params=sorted(LEVELS_DIR.glob('level*.wf')), ids=lambda path: path.name)
+def level_file(request):
+    '''
+    Every level of the game, one test each
+    '''
+    return request.param
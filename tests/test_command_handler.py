@@ -0,0 +1,123 @@
+import re
+
+import pytest
+
+from command_handler import MAX_NUMBER_DIGITS, CommandHandler
+from exceptions import CommandSyntaxError, EmptyPrompt, IncorrectLoopSyntax, UnmatchedParentheses
+
+
+def regex_expansion(prompt):
+    '''
+    The commands of a prompt without nested loops, found the way the regex parser did
+    '''
+    commands = []
+    for loop, iterations, body, group_id, cmds in re.findall(
+            r'((\d+)\[([^\[\]]*)\])|(\d+)([a-z+-]+)', prompt):
+        if loop:
+            commands.extend(int(iterations)*regex_expansion(body))
+        else:
+            commands.extend((int(group_id), cmd) for cmd in cmds)
+    return commands
+
+
+@pytest.mark.parametrize('prompt', [
+    '0t',
+    '1trev 3g 45fd',
+    '1t 2[1c] 1ef 2[3rr 2qc 1c] 1tq 4f',
+    '  0t\t\t12+-  ',
+    '3[0c] 4[1p]',
+    '(0tc 1+) 2[0c]',
+    '0[1t] 2t',
+])
+def test_expansion_of_prompts_without_nesting(prompt):
+    assert list(CommandHandler().compile(prompt)) == regex_expansion(prompt)
+
+
+@pytest.mark.parametrize('prompt, expected', [
+    ('2[1c 2[0t]]', [(1, 'c'), (0, 't'), (0, 't')]*2),
+    ('2[3[0c] 1p]', ([(0, 'c')]*3 + [(1, 'p')])*2),
+    ('2[2[2[0c]]]', [(0, 'c')]*8),
+    ('(0t (1c 2p)) 2[(0a)]', [(0, 't'), (1, 'c'), (2, 'p'), (0, 'a'), (0, 'a')]),
+    ('2[] () 1t', [(1, 't')]),
+    ('1t2[0c]1p', [(1, 't'), (0, 'c'), (0, 'c'), (1, 'p')]),
+])
+def test_nesting_and_groups(prompt, expected):
+    assert list(CommandHandler().compile(prompt)) == expected
+
+
+def test_deep_nesting():
+    depth = 2000
+    program = CommandHandler().compile('1[' * depth + '0c' + ']' * depth)
+    assert list(program) == [(0, 'c')]
+
+
+@pytest.mark.parametrize('prompt, error, column', [
+    ('0t x', CommandSyntaxError, 4),
+    ('a', CommandSyntaxError, 1),
+    ('0t 12', CommandSyntaxError, 4),
+    ('0t [1c]', CommandSyntaxError, 4),
+    ('1t 2[0c', UnmatchedParentheses, 5),
+    ('0t (1c', UnmatchedParentheses, 4),
+    ('1t 0c]', UnmatchedParentheses, 6),
+    ('0t (1c]', UnmatchedParentheses, 7),
+    ('2[1c)', UnmatchedParentheses, 5),
+    ('  0t   2[1c x]', CommandSyntaxError, 13),
+])
+def test_error_columns(prompt, error, column):
+    with pytest.raises(error) as excinfo:
+        CommandHandler().compile(prompt)
+    assert excinfo.value.column == column
+    assert f'at column {column}' in str(excinfo.value)
+
+
+def test_empty_prompt():
+    with pytest.raises(EmptyPrompt):
+        CommandHandler().compile('')
+
+
+def test_number_digits():
+    largest = '9'*MAX_NUMBER_DIGITS
+    handler = CommandHandler()
+    assert list(handler.compile(f'{largest}t')) == [(int(largest), 't')]
+    assert len(handler.compile(f'{largest}[0c]')) == int(largest)
+    for prompt, column in [(f'{largest}9t', 1), (f'0t 2[{largest}9c]', 6), (f'{largest}9[0c]', 1)]:
+        with pytest.raises(CommandSyntaxError, match='is too large') as excinfo:
+            handler.compile(prompt)
+        assert excinfo.value.column == column
+
+
+def test_program_size_overflow():
+    largest = '9'*MAX_NUMBER_DIGITS
+    handler = CommandHandler()
+    with pytest.raises(IncorrectLoopSyntax) as excinfo:
+        handler.compile(f'0t {largest}[{largest}[{largest}[0c]]]')
+    # the column of the bracket of the outer loop, the inner two still fit
+    assert excinfo.value.column == 4 + MAX_NUMBER_DIGITS
+    # each loop fits, together they do not
+    loop = f'{largest}[{largest}[5[0c]]]'
+    assert len(handler.compile(loop)) == int(largest)**2*5
+    with pytest.raises(CommandSyntaxError, match='runs more than'):
+        handler.compile(f'{loop} {loop}')
+
+
+@pytest.mark.parametrize('prompt', [
+    '1trev 3[2[3g] 1c] 45fd',
+    '0tc (1+ 2[3p])',
+    '5[4[3[0c] 1p]]',
+    '12p 2[] 1t',
+])
+def test_prompt_of_executed_commands(prompt):
+    handler = CommandHandler()
+    program = handler.compile(prompt)
+    commands = list(program)
+    assert list(handler.compile(program.prompt())) == commands
+    for executed in range(1, len(commands)):
+        assert list(handler.compile(program.prompt(executed))) == commands[:executed]
+    assert program.prompt(0) == ''
+
+
+def test_prompt_keeps_loops():
+    program = CommandHandler().compile('100000000[0c 1p]')
+    assert program.prompt() == '100000000[0c 1p]'
+    # 3 whole iterations and the first command of the 4th
+    assert program.prompt(7) == '3[0c 1p] 0c'
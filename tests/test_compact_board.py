@@ -0,0 +1,51 @@
+import random
+
+from objects import Game
+from solver import get_actions
+from zobrist import compute_state_hash
+
+
+def describe(game):
+    '''
+    Everything a player sees of the game, independently of the board
+    '''
+    cells = [(cell.pos, str(cell), cell.contents.pos) for _, cell in game.occupied_cells()]
+    # the pos of units which are not controllable is stale once they leave the field
+    units = [(unit.pos if unit.IS_CONTROLLABLE or not unit.is_active else None,
+              str(unit), unit.is_active) for unit in game.all_units]
+    return cells, units, ''.join(game.submitted), game.status(), game.goals.typos_left, \
+        game.number_of_commands
+
+
+def test_restore_snapshots(level_file):
+    rng = random.Random(level_file.name)
+    game = Game(level_file)
+    boards, descriptions = [], []
+    for command in rng.choices(get_actions(game), k=200):
+        game.execute_on_group_status(command)
+        boards.append(game.snapshot())
+        descriptions.append(describe(game))
+    for index in rng.sample(range(len(boards)), 20):
+        game.restore(boards[index])
+        assert describe(game) == descriptions[index]
+        assert game.snapshot() == boards[index]
+        # the restored game plays on like the original did
+        clone = game.clone()
+        for command in random.Random(index).choices(get_actions(game), k=20):
+            assert game.execute_on_group_status(command) == clone.execute_on_group_status(command)
+        assert describe(game) == describe(clone)
+
+
+def test_boards_compare_by_state(level_file):
+    rng = random.Random(level_file.name)
+    game = Game(level_file)
+    seen = {}
+    for command in rng.choices(get_actions(game), k=300):
+        game.execute_on_group_status(command)
+        board = game.snapshot()
+        assert board == game.clone().snapshot()
+        # equal boards are equal states, whatever the number of commands
+        state_hash = compute_state_hash(game)
+        assert seen.setdefault(board, state_hash) == state_hash
+    # and the other way round
+    assert len(set(seen.values())) == len(seen)
@@ -0,0 +1,69 @@
+from math import inf
+
+import pytest
+
+from goals import DEAD, POSSIBLE, WON, Goals, build_trie
+
+
+def submit_all(goals, letters):
+    statuses = []
+    for letter in letters:
+        goals.submit(letter)
+        statuses.append(goals.status())
+    return statuses
+
+
+@pytest.mark.parametrize('letters, statuses', [
+    ('HI', [POSSIBLE, WON]),
+    ('HIT', [POSSIBLE, WON, POSSIBLE]),
+    ('HITS', [POSSIBLE, WON, POSSIBLE, WON]),
+    ('HX', [POSSIBLE, DEAD]),
+    ('HIX', [POSSIBLE, WON, DEAD]),
+    # a dead game stays dead
+    ('XHI', [DEAD, DEAD, DEAD]),
+])
+def test_status_transitions(letters, statuses):
+    assert submit_all(Goals(['HI', 'HITS']), letters) == statuses
+
+
+def test_typos_hold_the_victory_back():
+    goals = Goals(['HI'], typos_left=2)
+    assert submit_all(goals, 'HI') == [POSSIBLE, POSSIBLE]
+    assert goals.word_created()
+    goals.typo_eliminated()
+    assert goals.status() == POSSIBLE
+    goals.typo_eliminated()
+    assert goals.status() == WON
+
+
+def test_letters_left():
+    goals = Goals(['ABCD', 'AX', 'BCD'])
+    assert goals.letters_left() == 2
+    goals.submit('A')
+    assert goals.letters_left() == 1
+    goals.submit('B')
+    assert goals.letters_left() == 2
+    goals.submit('X')
+    assert goals.letters_left() == inf
+    assert goals.status() == DEAD
+
+
+def test_restart():
+    goals = Goals(['HI'], typos_left=1)
+    submit_all(goals, 'X')
+    assert goals.status() == DEAD
+    goals.restart('HI', 0)
+    assert goals.status() == WON
+    goals.restart('H', 1)
+    assert (goals.status(), goals.typos_left) == (POSSIBLE, 1)
+
+
+def test_copies_are_independent():
+    goals = Goals(['HI', 'HA'])
+    goals.submit('H')
+    copy = goals.copy()
+    copy.submit('I')
+    goals.submit('X')
+    assert (copy.status(), goals.status()) == (WON, DEAD)
+    # the trie is shared by the games of a level
+    assert copy.root is goals.root is build_trie(['HI', 'HA'])
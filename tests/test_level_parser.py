@@ -0,0 +1,65 @@
+import pytest
+
+from exceptions import (GroupOfDifferentTypes, InvalidGroupMember, InvalidUnitArgument,
+                        NonExistingGroupMember, SubmitterNotFound, UnitOutsideOfField, UnknownUnit,
+                        WordsNotSpecified)
+from level_parser import parse_level
+
+
+LEVEL = '''@ Test
+words: {HI HO}
+letters: {HI}
+0 0 InitStack
+0 1 Manipulator direction=3
+1 1 Manipulator direction=0
+0 2 Submitter
+'''
+
+
+def level_lines(*extra):
+    return (LEVEL + ''.join(f'{line}\n' for line in extra)).splitlines(keepends=True)
+
+
+def test_parse_level():
+    spec = parse_level(level_lines('size: {4 5}', 'groups: {1 2}', '3 4 Card letter=\'A\'',
+                                   '# a note'))
+    assert spec.name == 'Test'
+    assert spec.words == ['HI', 'HO']
+    assert spec.letters == 'HI'
+    assert spec.board_size == (4, 5)
+    assert spec.groups == [[1, 2]]
+    assert spec.note == ['a note']
+    assert spec.units == [('InitStack', (0, 0), {}), ('Manipulator', (0, 1), {'direction': 3}),
+                          ('Manipulator', (1, 1), {'direction': 0}), ('Submitter', (0, 2), {}),
+                          ('Card', (3, 4), {'letter': 'A'})]
+
+
+@pytest.mark.parametrize('extra, error, line, column', [
+    (['2 2 Robot'], UnknownUnit, 8, 5),
+    (['2 2 Rock', '3 3 Flipper direction=x'], InvalidUnitArgument, 9, 23),
+    (['2 2 Piston direction=2 name=x1'], InvalidUnitArgument, 8, 29),
+    (['groups: {1 [2]}'], InvalidGroupMember, 8, 12),
+    (['groups: {1 2,3 [0]}'], InvalidGroupMember, 8, 16),
+    (['groups: {1 2,4}'], NonExistingGroupMember, 8, 14),
+    (['groups: {1 2, 2 7}'], NonExistingGroupMember, 8, 15),
+    (['groups: {1 3}'], GroupOfDifferentTypes, 8, 10),
+    (['size: {3 3}', '2 3 Rock'], UnitOutsideOfField, 9, 1),
+])
+def test_diagnostics(extra, error, line, column):
+    with pytest.raises(error) as excinfo:
+        parse_level(level_lines(*extra))
+    assert (excinfo.value.line, excinfo.value.column) == (line, column)
+    assert str(excinfo.value).endswith(f'at line {line}, column {column}')
+
+
+def test_units_are_checked_against_the_final_size():
+    # the size may come after the units it makes fit
+    spec = parse_level(level_lines('40 40 Rock', 'size: {50 50}'))
+    assert spec.units[-1] == ('Rock', (40, 40), {})
+
+
+def test_missing_submitter_and_words():
+    with pytest.raises(SubmitterNotFound):
+        parse_level([line for line in level_lines() if 'Submitter' not in line])
+    with pytest.raises(WordsNotSpecified):
+        parse_level([line for line in level_lines() if not line.startswith('words')])
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+
+import utils
+from utils import load_progress_data, update_solution
+
+
+PROCESSES = 6
+RECORDS = 400
+
+
+def record_solutions(path, writer, start):
+    # a tiny journal so that the writers compact it over and over while the others append
+    utils.JOURNAL_COMPACT_BYTES = 256
+    progress = {}
+    start.wait()
+    for i in range(RECORDS):
+        update_solution(progress, f'level{writer}.{i}.wf', 'A', i + 1, f'{writer}t {i}p', path)
+
+
+def test_no_record_is_lost_by_concurrent_writers(tmp_path):
+    path = os.path.join(tmp_path, 'save', 'save.json')
+    start = multiprocessing.Barrier(PROCESSES)
+    writers = [multiprocessing.Process(target=record_solutions, args=(path, writer, start))
+               for writer in range(PROCESSES)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(timeout=120)
+        assert writer.exitcode == 0
+    progress = load_progress_data(path)
+    assert progress == {f'level{writer}.{i}.wf': {'A': {'num_of_cmds': i + 1, 'solution': f'{writer}t {i}p'}}
+                        for writer in range(PROCESSES) for i in range(RECORDS)}
+    # the journal has been compacted into the progress file along the way
+    with open(path) as f:
+        assert f.read()
+
+
+def test_compaction_waits_for_a_journal_it_cannot_rename(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, 'save.json')
+    progress = {}
+    update_solution(progress, 'level1.1.wf', 'OK', 9, '0t 1p', path)
+
+    def held_open(source, destination):
+        raise PermissionError(13, 'The process cannot access the file', source)
+    monkeypatch.setattr(os, 'replace', held_open)
+    assert utils.compact_progress_data(path) is None
+    monkeypatch.undo()
+    # nothing is lost and the next compaction goes ahead
+    assert not os.path.exists(utils.compaction_lock_path(path))
+    assert utils.compact_progress_data(path) == load_progress_data(path) == progress
+
+
+def test_progress_file_in_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    progress = {}
+    update_solution(progress, 'a.wf', 'A', 1, '0t', path='save.json')
+    assert utils.compact_progress_data('save.json') == load_progress_data('save.json') == progress
+
+
+def test_compaction_whose_lock_was_taken_over(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, 'save.json')
+    progress = {}
+    update_solution(progress, 'level1.1.wf', 'OK', 9, '0t 1p', path)
+    load = utils.load_progress_data
+
+    def load_while_the_lock_is_released(path):
+        # another process takes the lock over as stale and releases it meanwhile
+        os.remove(utils.compaction_lock_path(path))
+        return load(path)
+    monkeypatch.setattr(utils, 'load_progress_data', load_while_the_lock_is_released)
+    assert utils.compact_progress_data(path) == progress
@@ -0,0 +1,45 @@
+import pytest
+
+from objects import Game
+from solver import OUT_OF_BUDGET, SOLVED, Heuristic, solve
+from verify import compile_solution, replay_solution
+
+
+@pytest.mark.parametrize('level_name, word, num_of_cmds', [
+    ('level0.1.wf', 'HI', 8),
+    ('level0.13.wf', 'AH', 22),
+    ('level1.2.wf', 'ABC', 20),
+    ('level2.1.wf', 'PART', 30),
+    ('level3.6.wf', '.', 12),
+])
+def test_minimal_solutions(levels_dir, level_name, word, num_of_cmds):
+    level_file = levels_dir / level_name
+    outcome, result = solve(level_file, max_states=5000)
+    assert outcome == SOLVED
+    assert result[:2] == (word, num_of_cmds)
+    # the solution string plays back to the same victory
+    _, victory = replay_solution(level_file, result[2])
+    assert victory == (word, num_of_cmds)
+
+
+@pytest.mark.parametrize('level_name, solution, num_of_cmds', [
+    ('level0.13.wf', '0tsp 1++ 2ctcpctap', 22),
+    # an anvil crushes units which never move otherwise
+    ('level1.3.wf', '3t 2st 1ctsp 0+ 2ptapatsp 3cp 0+ 2ctap 0+ 2ctap 0+ 2ctap 0+ 2ctap 0+', 39),
+    ('level3.2.wf', '0at 1ctcpstcp 0sp 2t 3tcp 2cp', 18),
+])
+def test_heuristic_is_admissible(levels_dir, level_name, solution, num_of_cmds):
+    # along a minimal solution the estimate never exceeds the commands still to go
+    game = Game(levels_dir / level_name)
+    heuristic = Heuristic(game)
+    assert heuristic(game) <= num_of_cmds
+    for program in compile_solution(game.command_handler, solution):
+        for command in program:
+            game.execute_on_group_status(command)
+            assert heuristic(game) <= num_of_cmds - game.number_of_commands
+    assert all(game.is_victory())
+    assert game.number_of_commands == num_of_cmds
+
+
+def test_out_of_budget(levels_dir):
+    assert solve(levels_dir / 'level2.1.wf', max_states=10) == (OUT_OF_BUDGET, None)
@@ -0,0 +1,53 @@
+import random
+
+from objects import Game
+from solver import get_actions
+from zobrist import compute_state_hash
+
+
+def play_and_check(game, commands):
+    for command in commands:
+        game.execute_on_group_status(command)
+        assert compute_state_hash(game) == game.get_state_hash()
+
+
+def test_hash_follows_random_play(level_file):
+    rng = random.Random(level_file.name)
+    game = Game(level_file)
+    play_and_check(game, rng.choices(get_actions(game), k=300))
+
+
+def test_hash_of_clones(level_file):
+    rng = random.Random(level_file.name)
+    game = Game(level_file)
+    play_and_check(game, rng.choices(get_actions(game), k=100))
+    clone = game.clone()
+    assert clone.get_state_hash() == game.get_state_hash() == compute_state_hash(clone)
+    # the clone and the original go on independently
+    play_and_check(clone, rng.choices(get_actions(clone), k=100))
+    play_and_check(game, rng.choices(get_actions(game), k=100))
+
+
+def test_hashing_started_mid_game(level_file):
+    rng = random.Random(level_file.name)
+    game = Game(level_file)
+    assert game.state_hash is None
+    for command in rng.choices(get_actions(game), k=100):
+        game.execute_on_group_status(command)
+    # an unhashed clone starts hashing on its own
+    clone = game.clone()
+    assert clone.state_hash is None
+    assert game.get_state_hash() == clone.get_state_hash() == compute_state_hash(game)
+    play_and_check(clone, rng.choices(get_actions(clone), k=100))
+
+
+def test_hash_on_a_sparse_field(tmp_path):
+    level_file = tmp_path / 'level1.wf'
+    level_file.write_text('words: {AB}\nletters: {AB}\nsize: {200 200}\n'
+                          '0 0 InitStack\n0 1 Manipulator direction=3\n0 2 Stack\n'
+                          '199 199 Submitter\n1 1 Manipulator direction=0\n')
+    rng = random.Random(0)
+    game = Game(level_file)
+    assert game.is_sparse()
+    play_and_check(game, rng.choices(get_actions(game), k=200))
+    play_and_check(game.clone(), rng.choices(get_actions(game), k=200))
@@ -1,6 +1,7 @@
 import re
 import json
 import os
+import time
 from pathlib import PurePath
 
 DIRECTIONS = {
@@ -8,29 +9,49 @@ DIRECTIONS = {
     # up right down left
 }
 FRAMERATE = 30
+# an idle window still wakes up this often, e.g. for the text cursor to blink
+IDLE_WAKEUP_MS = 500
+# how long an instant execution may run per frame before the window gets to draw
+INSTANT_RUN_BUDGET_MS = 20
+# commands per frame of a playing compiled sequence; None is as many as fit into INSTANT_RUN_BUDGET_MS
+PLAYBACK_SPEEDS = (1, 4, 16, 64, 256, 1024, None)
 WINDOW_SIZE = (1200, 800)
 CELL_SIZE = (100, 100)
 MARGIN = 3
 BOARD_SIZE = (6, 8)
+# boards with more cells than this keep their cells in a sparse map
+SPARSE_FIELD_MIN_CELLS = 10000
 LEVELS_GRID_SIZE = (7, 9)
 GROUP_ID_TEXTBOX_SIZE = (30, 28)
 COMMAND_INPUT_FORBIDDEN_CHARS = ['/']
 COMMAND_INPUT_HEIGHT = 40
+# how many commands of a compiled sequence CommandFeedback shows at once
+COMMAND_FEEDBACK_WINDOW = 60
 MUSIC_DEFAULT_VOLUME = 0
 SFX_DEFAULT_VOLUME = 0.4
+# decoded sound effects kept in memory at once
+SFX_CACHE_SIZE = 12
 LEVELS_DIR_TEXT = 'levels'
 LEVELS_DIR = PurePath(LEVELS_DIR_TEXT)
 SFX_DIR = PurePath('assets', 'SFX')
 SAVES_FILE_PATH = PurePath('assets', 'save', 'save.json')
+# the journal of new solutions is merged into the save file once it grows larger than this
+JOURNAL_COMPACT_BYTES = 256*1024
+# a compaction lock file older than this was left by a crashed process
+COMPACTION_LOCK_STALE_SECONDS = 60
+LEVEL_CACHE_DIR = PurePath('assets', 'cache', 'levels')
+LEVEL_INDEX_DIR = PurePath('assets', 'cache', 'index')
+PROFILE_FILE_PATH = PurePath('assets', 'save', 'profile.json')
 
 UNITS = {'manipulator', 'portal', 'conveyorbelt', 'rock', 'initstack', 'stack', 'flipper',
          'submitter', 'card', 'piston', 'anvil', 'typo'}
 CONTROLLABLE_UNITS = {'manipulator', 'conveyorbelt', 'flipper', 'piston'}
+UNIT_COMMANDS = {'manipulator': 'tpcas', 'conveyorbelt': '+-', 'flipper': 'f', 'piston': 'x'}
 
 
-def inside_borders(pos):
+def inside_borders(pos, board_size=BOARD_SIZE):
     row, col = pos
-    return 0 <= row < BOARD_SIZE[0] and 0 <= col < BOARD_SIZE[1]
+    return 0 <= row < board_size[0] and 0 <= col < board_size[1]
 
 
 def shift(vec1: tuple[int, int], vec2: tuple[int, int]) -> tuple[int, int]:
@@ -62,30 +83,29 @@ def get_level_number_from_filename(filename):
 
 
 
-def load_level_filenames():
-    def key(file):
-        match = level_filename_pattern.match(file)
-        if not match:
-            return 10000
-        lvl_num, _, sub_lvl_num = match.groups()
-        if sub_lvl_num:
-            return int(lvl_num) + int(sub_lvl_num)/1000
-        return int(lvl_num)
+level_filename_pattern = re.compile(r'level(\d+)(\.(\d+))?.wf')
 
-    level_files = os.listdir(LEVELS_DIR)
 
-    level_filename_pattern = re.compile(r'level(\d+)(\.(\d+))?.wf')
-    result = [el for el in level_files if el.startswith(
-        'level') and el.endswith('.wf')]
-    result.sort(key=key)
-    return result
+def level_sort_key(filename):
+    match = level_filename_pattern.match(filename)
+    if not match:
+        return 10000
+    lvl_num, _, sub_lvl_num = match.groups()
+    if sub_lvl_num:
+        return int(lvl_num) + int(sub_lvl_num)/1000
+    return int(lvl_num)
+
+
+def is_level_filename(filename):
+    return filename.startswith('level') and filename.endswith('.wf')
 
 
 HELP_TEXT = {
     'rules': 'Move Cards to the Submitter in correct order by giving commands to controllable units; the goal is to create one of the words from inside of the curly braces shown after the level number.<br>' +
     'Controllable units are placed into controllable groups which have a unique id (shown in the cells\' top right corner); commands are given to those groups and executed by all units inside of them simultaneously.<br>' +
-    paint('Controls', '#62AAF7') + ':<br>-to execute a single command ([group_id][command_character]) press RETURN;<br>-to compile a sequence of commands* press Shift+Return, then press RETURN to execute selected command (press Esc to exit this mode);<br>' +
-    '-to execute a sequence of commands instantly just press RETURN.<br>',
+    paint('Controls', '#62AAF7') + ':<br>-to execute a single command ([group_id][command_character]) press RETURN;<br>-to compile a sequence of commands* press Shift+Return, then press RETURN to execute selected command or Space to play/pause the sequence, +/- change the playback speed (press Esc to exit this mode);<br>' +
+    '-to execute a sequence of commands instantly just press RETURN (a long one shows its progress, press Esc to cancel it);<br>' +
+    '-to scroll a field larger than the screen press Ctrl+arrow keys.<br>',
 
     'card':
     'A unit with a letter (or a period) on it. Needs to be submitted to the Submitter in such an order that one of the words is created.',
@@ -166,7 +186,9 @@ SYNTAX_REF_TEXT = [
     '  N[...],'
     '    where N is a number of iterations and ... is a command or a sequence of commands to be repeated;',
     f'    example: {paint("3[2a]", "#3AD8E2")} is equivalent to {paint("2a 2a 2a", "#3AD8E2")}',
-    f'    example: {paint("2[3tapc 1+]", "#3AD8E2")} is equivalent to {paint("3tapc 1+ 3tapc 1+", "#3AD8E2")}'
+    f'    example: {paint("2[3tapc 1+]", "#3AD8E2")} is equivalent to {paint("3tapc 1+ 3tapc 1+", "#3AD8E2")}',
+    'Loops can be nested:',
+    f'    example: {paint("2[2[0c] 1+]", "#3AD8E2")} is equivalent to {paint("0c 0c 1+ 0c 0c 1+", "#3AD8E2")}'
 
 ]
 
@@ -188,21 +210,175 @@ def help_commands_processing(raw_command: str):
         return s1 + s2 + s3 + s4 + s5
 
 
-def load_progress_data():
+def journal_path(path):
+    # solutions recorded since the last compaction, one JSON record per line
+    return PurePath(path).with_suffix('.journal')
+
+
+def compacting_journal_path(path):
+    # the journal being merged into the progress file; new records go to a fresh journal meanwhile
+    return PurePath(path).with_suffix('.journal.compacting')
+
+
+def compaction_lock_path(path):
+    return PurePath(path).with_suffix('.lock')
+
+
+def replay_journal(saves, journal):
+    '''
+    Merges the records of a journal into saves; a record torn by a crash in the middle of an append is skipped
+    '''
+    try:
+        with open(journal, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                merge_solution(saves, record['filename'], record['word'],
+                               record['num_of_cmds'], record['solution'])
+    except FileNotFoundError:
+        pass
+
+
+def load_progress_data(path=SAVES_FILE_PATH):
+    '''
+    Loads the last compacted progress and replays the journals on top of it
+    '''
     try:
-        with open(SAVES_FILE_PATH, 'r') as f:
+        with open(path, 'r') as f:
             saves = json.load(f)
     except FileNotFoundError:
         saves = dict()
+    replay_journal(saves, compacting_journal_path(path))
+    replay_journal(saves, journal_path(path))
     return saves
 
 
-def save_progress_data(data_to_save):
-    with open(SAVES_FILE_PATH, 'w') as f:
-        json.dump(data_to_save, f)
+def write_file_atomically(path, content):
+    '''
+    Writes content (str or bytes) under a temporary name and renames it to path,
+    so that readers and crashes see either the old or the new file, never a partial one
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # a name of its own for every process writing the same file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_progress_data(data_to_save, path=SAVES_FILE_PATH):
+    '''
+    Atomically replaces the progress file with data_to_save
+    '''
+    write_file_atomically(path, json.dumps(data_to_save))
 
 
-def update_solution(progress_data_dict, filename, submitted_word, num_of_cmds, solution):
+def acquire_compaction_lock(path):
+    '''
+    Creates the lock file of the progress file; returns False if another process holds it.
+    A lock left behind by a crashed process is taken over once it is COMPACTION_LOCK_STALE_SECONDS old
+    '''
+    lock_path = compaction_lock_path(path)
+    for _ in range(2):
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) < COMPACTION_LOCK_STALE_SECONDS:
+                    return False
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def compact_progress_data(path=SAVES_FILE_PATH):
+    '''
+    Merges the journal into the progress file and returns the progress, or None if it has to wait:
+    another process is compacting or, on Windows, has the journal or the progress file open.
+    Several processes may share the progress file, so it is rebuilt from disk rather than
+    from the memory of one of them: the journal is renamed aside (appends go to a new one),
+    merged with the progress file and removed once the progress file is replaced.
+    A record which lands in the renamed journal is appended again by its writer, see append_to_journal
+    '''
+    if not acquire_compaction_lock(path):
+        return None
+    try:
+        compacting = compacting_journal_path(path)
+        # a compaction which crashed left its journal to be merged first
+        if not os.path.exists(compacting):
+            try:
+                os.replace(journal_path(path), compacting)
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # on Windows a journal which another process has open cannot be renamed;
+                # like a held lock, the compaction is left to a later record
+                return None
+        saves = load_progress_data(path)
+        try:
+            save_progress_data(saves, path)
+        except PermissionError:
+            # the same for a progress file being read; the renamed journal is merged next time
+            return None
+        try:
+            os.remove(compacting)
+        except (FileNotFoundError, PermissionError):
+            # a journal left behind is merged again, which does no harm
+            pass
+        return saves
+    finally:
+        try:
+            os.remove(compaction_lock_path(path))
+        except FileNotFoundError:
+            # another process took the lock over as stale and has already released it
+            pass
+
+
+def append_to_journal(record, path=SAVES_FILE_PATH):
+    '''
+    Appends a record to the journal of the progress file; returns the size of the journal.
+    A writer may open the journal just before a compaction renames it aside, and its record
+    could then be written after the merge. So the record is appended again until it is written
+    to the file which is still the journal once the write is over: the rename happens after
+    that write and the compaction merges it. Records are idempotent, a duplicate does no harm
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # the record starts on a new line even if the last append was torn by a crash
+    line = '\n' + json.dumps(record)
+    while True:
+        with open(journal_path(path), 'a') as f:
+            f.write(line)
+            f.flush()
+            journal_size = f.tell()
+            written_to = os.fstat(f.fileno())
+        try:
+            if os.path.samestat(written_to, os.stat(journal_path(path))):
+                return journal_size
+        except FileNotFoundError:
+            pass
+
+
+def merge_solution(progress_data_dict, filename, submitted_word, num_of_cmds, solution) -> bool:
+    '''
+    Keeps the solution if it is the first or the shortest one for the word; returns whether it was kept
+    '''
     this_word_to_save = {
         'num_of_cmds': num_of_cmds,
         'solution': solution
@@ -213,12 +389,30 @@ def update_solution(progress_data_dict, filename, submitted_word, num_of_cmds, s
         if this_word and num_of_cmds <= this_word['num_of_cmds'] or not this_word:
             this_entry[submitted_word] = this_word_to_save
             progress_data_dict[filename] = this_entry
-    else:
-        this_entry = {
-            submitted_word: this_word_to_save
-        }
-        progress_data_dict[filename] = this_entry
-    save_progress_data(progress_data_dict)
+            return True
+        return False
+    this_entry = {
+        submitted_word: this_word_to_save
+    }
+    progress_data_dict[filename] = this_entry
+    return True
+
+
+def update_solution(progress_data_dict, filename, submitted_word, num_of_cmds, solution, path=SAVES_FILE_PATH):
+    '''
+    Records a solution by appending it to the journal, which costs O(record);
+    the journal is compacted into the progress file once it outgrows JOURNAL_COMPACT_BYTES,
+    by this process unless another one is compacting already
+    '''
+    if not merge_solution(progress_data_dict, filename, submitted_word, num_of_cmds, solution):
+        return
+    record = {'filename': filename, 'word': submitted_word,
+              'num_of_cmds': num_of_cmds, 'solution': solution}
+    if append_to_journal(record, path) > JOURNAL_COMPACT_BYTES:
+        saves = compact_progress_data(path)
+        if saves is not None:
+            # the progress on disk has the solutions of the other processes too
+            progress_data_dict.update(saves)
 
 
 if __name__ == '__main__':
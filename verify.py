@@ -0,0 +1,140 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePath
+
+from exceptions import CustomException
+from level_index import load_level_index
+from objects import Game
+from utils import LEVELS_DIR, SAVES_FILE_PATH, load_progress_data
+
+
+def solution_prompts(solution):
+    '''
+    Splits a solution string (the prompts of command_history joined by spaces) back into prompts.
+    A loop may span several words, so a prompt is the shortest run of words whose brackets close;
+    a word opening a bracket which is never closed is a prompt of its own (and does not compile)
+    '''
+    words = solution.split()
+    start = 0
+    while start < len(words):
+        depth = 0
+        for end in range(start, len(words)):
+            word = words[end]
+            depth += word.count('[') + word.count('(') - word.count(']') - word.count(')')
+            if depth <= 0:
+                break
+        else:
+            end = start
+        yield ' '.join(words[start:end + 1])
+        start = end + 1
+
+
+def compile_solution(command_handler, solution):
+    '''
+    The compiled prompts of a solution; like in the GUI a prompt which fails to compile is skipped
+    '''
+    programs = []
+    for prompt in solution_prompts(solution):
+        try:
+            programs.append(command_handler.compile(prompt))
+        except CustomException:
+            pass
+    return programs
+
+
+def replay_solution(level_file, solution):
+    '''
+    Replays a solution string (space-separated prompts of command_history) headlessly.
+    Returns the game after the last command and the (submitted word, number of commands)
+    at the first victory or None if there was none
+    '''
+    game = Game(level_file)
+    return game, replay_programs(game, compile_solution(game.command_handler, solution))
+
+
+def replay_programs(game, programs):
+    '''
+    Executes every command of the compiled prompts on a loaded game.
+    Like in the GUI, a command which raises is skipped and the rest go on.
+    Returns the (submitted word, number of commands) at the first victory or None
+    '''
+    first_victory = None
+    for program in programs:
+        for command in program:
+            # a failed command is skipped like in the GUI, there is no need for its exception
+            game.execute_on_group_status(command)
+            if first_victory is None and all(game.is_victory()):
+                first_victory = ''.join(game.submitted), game.number_of_commands
+    return first_victory
+
+
+def verify_entry(task):
+    '''
+    Checks a single save entry; returns None if it reproduces or a description of what went wrong.
+    The GUI judges a prompt when it is over but a stepped one at every command, so the entry
+    may be saved either at the first victory or after the last prompt
+    '''
+    levels_dir, filename, word, entry = task
+    try:
+        game, first_victory = replay_solution(PurePath(levels_dir, filename), entry['solution'])
+    except (CustomException, OSError) as e:
+        return f'{filename} {word}: {e.__class__.__name__} {e}'
+    outcomes = [first_victory] if first_victory is not None else []
+    if all(game.is_victory()):
+        outcomes.append((''.join(game.submitted), game.number_of_commands))
+    if not outcomes:
+        submitted_word = ''.join(game.submitted)
+        return f'{filename} {word}: no victory, submitted "{submitted_word}"'
+    if (word, entry['num_of_cmds']) in outcomes:
+        return None
+    if all(submitted_word != word for submitted_word, _ in outcomes):
+        return f'{filename} {word}: submitted "{outcomes[-1][0]}" instead'
+    counts = ' or '.join(dict.fromkeys(str(num_of_cmds) for _, num_of_cmds in outcomes))
+    return f'{filename} {word}: {counts} commands instead of {entry["num_of_cmds"]}'
+
+
+def verify_all(progress_data_dict, levels_dir=LEVELS_DIR, workers=None):
+    '''
+    Replays every saved solution in a process pool (one worker per core by default);
+    returns the list of failure descriptions and the number of checked solutions.
+    Solutions of levels which are missing or fail to load are reported without a replay
+    '''
+    index = load_level_index(levels_dir)
+    tasks = []
+    failures = []
+    for filename, words in progress_data_dict.items():
+        for word, entry in words.items():
+            if filename not in index:
+                failures.append(f'{filename} {word}: no such level')
+            elif index[filename]['error']:
+                failures.append(f'{filename} {word}: {index[filename]["error"]}')
+            else:
+                tasks.append((levels_dir, filename, word, entry))
+    if not tasks:
+        return failures, len(failures)
+    # failures found before the replay are not among the tasks
+    unreplayed = len(failures)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(verify_entry, tasks,
+                               chunksize=max(1, len(tasks)//(4*workers)))
+        failures.extend(result for result in results if result is not None)
+    return failures, len(tasks) + unreplayed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Replay every saved solution and check that it still reproduces')
+    parser.add_argument('--save-file', default=SAVES_FILE_PATH)
+    parser.add_argument('--levels-dir', default=LEVELS_DIR)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes, one per core by default')
+    args = parser.parse_args()
+    failures, checked = verify_all(
+        load_progress_data(args.save_file), args.levels_dir, args.workers)
+    for failure in failures:
+        print(failure)
+    print(f'{checked - len(failures)}/{checked} solutions reproduced')
+    sys.exit(1 if failures else 0)
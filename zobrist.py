@@ -0,0 +1,85 @@
+from functools import lru_cache
+from hashlib import blake2b
+
+
+# unit attributes which are part of a game state, see Unit.set_state
+HASHED_ATTRIBUTES = frozenset(
+    {'holds', 'direction', 'orientation', 'active', 'eliminated', 'is_active'})
+
+
+@lru_cache(maxsize=None)
+def zobrist_key(feature: tuple) -> int:
+    '''
+    Random-looking 64-bit key of a state feature; derived from the feature itself
+    so that hashes are stable across games and processes
+    '''
+    return int.from_bytes(blake2b(repr(feature).encode(), digest_size=8).digest(), 'little')
+
+
+def attribute_value(value):
+    # units are referred to by their ids
+    return getattr(value, 'id', value)
+
+
+class StateHash:
+    '''
+    Zobrist hash of a game state: the XOR of the keys of all present features.
+    A feature is toggled in when it appears and toggled out when it disappears,
+    so every change of the state costs O(1) to account for.
+    Features:
+        ('cell', pos, unit_id) -- a unit in a cell
+        ('attr', unit_id, name, value) -- one of the HASHED_ATTRIBUTES of a unit
+        ('stack', unit_id, index, unit_id) -- a unit inside of a stack
+        ('submitted', index, letter) -- a submitted letter
+    Units left pending in a cell by a command which raised are not a part of the state.
+    Since every change passes through here, the changes are also reported to the
+    changes.ChangeLog set as changes, if any
+    '''
+
+    def __init__(self, value=0, changes=None):
+        self.value = value
+        self.changes = changes
+
+    def toggle(self, feature):
+        self.value ^= zobrist_key(feature)
+
+    def toggle_cell(self, pos, unit):
+        if unit is not None:
+            self.value ^= zobrist_key(('cell', pos, unit.id))
+        if self.changes is not None:
+            self.changes.cell_changed(pos, unit)
+
+    def toggle_attribute(self, unit, name, value):
+        self.value ^= zobrist_key(
+            ('attr', unit.id, name, attribute_value(value)))
+        if self.changes is not None:
+            self.changes.unit_changed(unit)
+
+    def toggle_stack(self, stack_unit, index, unit):
+        self.value ^= zobrist_key(('stack', stack_unit.id, index, unit.id))
+        if self.changes is not None:
+            self.changes.unit_changed(stack_unit)
+
+    def toggle_submitted(self, index, letter, submitter=None):
+        self.value ^= zobrist_key(('submitted', index, letter))
+        if self.changes is not None and submitter is not None:
+            self.changes.unit_changed(submitter)
+
+
+def compute_state_hash(game) -> int:
+    '''
+    Computes the hash of a game state from scratch in O(state); the incrementally
+    maintained game.state_hash.value must always be equal to it
+    '''
+    state_hash = StateHash()
+    for _, cell in game.occupied_cells():
+        state_hash.toggle_cell(cell.pos, cell.contents)
+    for unit in game.all_units:
+        for name in HASHED_ATTRIBUTES:
+            if name in unit.__dict__:
+                state_hash.toggle_attribute(unit, name, unit.__dict__[name])
+        for index, stacked in enumerate(getattr(unit, 'stack', ())):
+            state_hash.toggle_stack(unit, index, stacked)
+    for index, letter in enumerate(game.submitted):
+        state_hash.toggle_submitted(index, letter)
+    return state_hash.value